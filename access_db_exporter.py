@@ -1,28 +1,1785 @@
-import win32com.client
 import os
 import sys
+import argparse
+import glob
+import subprocess
+import io
+import multiprocessing.connection
+import concurrent.futures
 import tkinter
 import json
-import http.client
+import queue
+import sqlite3
+import threading
+import hashlib
+import re
+import time
+import contextlib
 import mimetypes
-from urllib.parse import quote
+import fnmatch
+import datetime
+import decimal
+import shutil
+import zipfile
+import itertools
+import types
+import signal
+import secrets
+import tempfile
 from enum import IntFlag
 from tkinter.filedialog import askopenfilename
 from tkinter.messagebox import askyesno
 
-class ms_access_automation():
+class access_backend():
+    '''Interface of the objects that provide the Access.Application an ms_access_automation talks to.
+
+    The automation only touches CurrentProject.AllModules/AllForms, CurrentData.AllQueries/AllTables,
+    CurrentDb().QueryDefs/TableDefs/Relations/OpenRecordset, Modules, Forms and DoCmd, so any object that offers that surface can stand in for
+    Access.'''
+
+    def create_application(self):
+        '''Returns a new Access.Application (or an object that behaves like one).'''
+        raise NotImplementedError
+
+    def attach_application(self,db_path = None):
+        '''Returns the running Access.Application that has the database open (or, without a database, the one that is
+        running). It belongs to whoever started it, so it must never be closed or quit.'''
+        raise NotImplementedError
+
+    def application_process_id(self,application):
+        '''Returns the id of the process running the Access.Application, or None if it isn't a process that can be
+        terminated.'''
+        return None
+
+    def accepts(self,db_path):
+        '''Returns true if the path points to a database this backend can open. Otherwise false.'''
+        raise NotImplementedError
+
+class com_access_backend(access_backend):
+    '''Backend that drives a real MS Access instance through COM.
+
+    By default the Access and DAO type libraries are wrapped early-bound (through makepy), so reading a property is a
+    direct call instead of a name lookup on every new object, which is what makes mining wide tables slow when
+    late-bound.'''
+
+    # Microsoft Office Access database engine Object Library (ACE DAO 12.0).
+    _dao_type_library = ('{4AC9E1DA-5BAD-4AC7-86E3-24F4CDCECA28}',0,12,0)
+
+    def __init__(self,early_bound = True):
+        self.early_bound = early_bound
+
+    def create_application(self):
+        '''Starts MS Access through COM, early-bound if possible and late-bound otherwise.'''
+
+        # Imported here so the rest of the exporter can run on machines that don't have pywin32.
+        import win32com.client
+
+        if self.early_bound:
+            try:
+                # The DAO wrappers are generated too so the TableDefs, Fields and Indexes are early-bound as well.
+                try:
+                    win32com.client.gencache.EnsureModule(*self._dao_type_library)
+                except Exception:
+                    pass
+                return win32com.client.gencache.EnsureDispatch('Access.Application')
+            except Exception:
+                # The wrappers can't be generated (e.g. the gen_py cache is read-only), so fall back to late binding.
+                pass
+        return win32com.client.Dispatch('Access.Application')
+
+    def attach_application(self,db_path = None):
+        '''Attaches to a running MS Access instance: the active one if it has the database open (or no database is given),
+        otherwise the one GetObject binds to through the running object table.'''
+
+        import win32com.client
+
+        def _has_database_open(application):
+            '''Returns true if the instance has the database open. Otherwise false.'''
+            full_name = application.CurrentProject.FullName
+            return bool(full_name) and os.path.normcase(os.path.abspath(full_name)) == os.path.normcase(os.path.abspath(db_path))
+
+        try:
+            application = win32com.client.GetActiveObject('Access.Application')
+        except Exception:
+            application = None
+        if db_path and (application is None or not _has_database_open(application)):
+            application = win32com.client.GetObject(os.path.abspath(db_path))
+        if application is None:
+            raise RuntimeError('No MS Access instance is running.')
+
+        if self.early_bound:
+            try:
+                return win32com.client.gencache.EnsureDispatch(application)
+            except Exception:
+                pass
+        return application
+
+    def application_process_id(self,application):
+        '''Finds the MS Access process through its main window. Returns None if it can't be found.'''
+
+        try:
+            import win32process
+            return win32process.GetWindowThreadProcessId(application.hWndAccessApp())[1]
+        except Exception:
+            return None
+
+    def accepts(self,db_path):
+        '''Accepts any existing MS Access file.'''
+        return os.path.isfile(db_path) and os.path.splitext(db_path)[1] in ['.accdb']
+
+class fake_access_backend(access_backend):
+    '''Backend that emulates the part of the Access object model used by the exporter in pure python.
+
+    The "database" is a fixture, either a JSON file shaped like:
+
+        {
+          "modules" : [{"name" : "Module1", "type" : 0, "code" : "...", "date_modified" : "..."}],
+          "forms" : [{"name" : "Form1", "code" : "..." or null, "date_modified" : "..."}],
+          "reports" : [{"name" : "Report1", "date_modified" : "..."}],
+          "macros" : [{"name" : "Macro1", "date_modified" : "..."}],
+          "queries" : [{"name" : "Query1", "sql" : "...", "date_modified" : "..."}],
+          "tables" : [{"name" : "Table1", "attributes" : 0, "fields" : [{"name" : "ID", "type" : 4, "required" : false,
+                        "size" : 4, "allow_zero_length" : false}], "indexes" : [{"name" : "PrimaryKey", "primary" : true,
+                        "unique" : true, "fields" : [{"name" : "ID", "descending" : false}]}], "date_modified" : "..."}],
+          "relations" : [{"name" : "Table1Table2", "table" : "Table1", "foreign_table" : "Table2", "attributes" : 0,
+                          "fields" : [{"name" : "ID", "foreign_name" : "Table1ID"}]}]
+        }
+
+    Linked tables have a "connect" string (and a "source_table_name") instead of local data. The rows of local tables
+    can be given as "rows" : [[value of the first field, value of the second field, ...], ...].
+
+    or a directory laid out like git_exports (modules/*.bas|*.cls with form modules named Form_*.cls, queries/*.txt,
+    tables/*.txt and the forms/reports/macros/*.txt written by SaveAsText), in which case the files' modification times
+    stand in for DateModified. Forms, reports and macros can hold the "text" SaveAsText writes for them; otherwise a
+    minimal definition is made up.'''
+
+    def create_application(self):
+        '''Returns an emulated Access.Application with no database open.'''
+        return fake_access_application()
+
+    # The emulated instances that have a database open, keyed by the database's path, so they can be attached to.
+    running_applications = {}
+
+    def attach_application(self,db_path = None):
+        '''Returns the emulated instance (started in this process) that has the database open.'''
+
+        if db_path is None and fake_access_backend.running_applications:
+            return list(fake_access_backend.running_applications.values())[-1]
+        application = fake_access_backend.running_applications.get(os.path.abspath(db_path or ''))
+        if application is None:
+            raise RuntimeError('No running (fake) MS Access instance has "' + str(db_path) + '" open.')
+        return application
+
+    def accepts(self,db_path):
+        '''Accepts a JSON fixture or a fixture directory.'''
+        return os.path.isdir(db_path) or (os.path.isfile(db_path) and os.path.splitext(db_path)[1] in ['.json'])
+
+class fake_object():
+    '''Plain attribute bag standing in for a COM object.'''
+
+    def __init__(self,**attributes):
+        self.__dict__.update(attributes)
+
+class fake_collection():
+    '''Emulates a COM collection: iterable, callable and indexable by name or position.'''
+
+    def __init__(self,items = ()):
+        self._items = {item.Name : item for item in items}
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def __call__(self,index):
+        return list(self._items.values())[index] if isinstance(index,int) else self._items[index]
+
+    def __getitem__(self,index):
+        return self(index)
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def Append(self,item):
+        self._items[item.Name] = item
+
+    def Delete(self,name):
+        del self._items[name]
+
+class fake_module():
+    '''Emulates the Module object of a standard, class or form module.'''
+
+    def __init__(self,name,module_type,code):
+        self.Name = name
+        self.Type = module_type
+        self._lines = code.replace('\r\n','\n').split('\n') if code else []
+
+    @property
+    def CountOfLines(self):
+        return len(self._lines)
+
+    def Lines(self,start_line,number_of_lines):
+        return '\r\n'.join(self._lines[start_line - 1:start_line - 1 + number_of_lines])
+
+    def AddFromString(self,code):
+        self._lines += code.replace('\r\n','\n').split('\n')
+
+    def DeleteLines(self,start_line,count = 1):
+        del self._lines[start_line - 1:start_line - 1 + count]
+
+class fake_vb_components(fake_collection):
+    '''Emulates VBProject.VBComponents, whose components are added under a default name and renamed afterwards.'''
+
+    def __init__(self,components = ()):
+        self._components = list(components)
+
+    @property
+    def _items(self):
+        return {component.Name : component for component in self._components}
+
+    def Add(self,component_type):
+        # 1 = vbext_ct_StdModule and 2 = vbext_ct_ClassModule.
+        name = ('Module' if component_type == 1 else 'Class') + str(len(self._components) + 1)
+        component = fake_object(Name = name,Type = component_type,CodeModule = fake_module(name,0 if component_type == 1 else 1,''))
+        self._components += [component]
+        return component
+
+    def Remove(self,component):
+        self._components.remove(component)
+
+    def Import(self,file_name):
+        # The name comes from the VB_Name attribute; the header and the attributes are not part of the code.
+        with open(file = file_name,mode = 'r',encoding = 'utf-8',newline = '') as file:
+            lines = file.read().replace('\r\n','\n').split('\n')
+        name = next(line.split('"')[1] for line in lines if line.startswith('Attribute VB_Name = '))
+        if 'END' in lines: lines = lines[lines.index('END') + 1:]
+        component_type = 2 if file_name.endswith('.cls') else 1
+        component = fake_object(Name = name,Type = component_type,
+                                CodeModule = fake_module(name,component_type - 1,'\n'.join(line for line in lines if not line.startswith('Attribute '))))
+        self._components += [component]
+        return component
+
+class fake_recordset():
+    '''Emulates a forward-only DAO Recordset over rows held in memory.'''
+
+    def __init__(self,rows):
+        self._rows = list(rows)
+        self._position = 0
+
+    @property
+    def EOF(self):
+        return self._position >= len(self._rows)
+
+    def GetRows(self,number_of_rows = 1):
+        # Like pywin32, the rows come back transposed: one tuple per field holding that field's value in every row.
+        rows = self._rows[self._position:self._position + number_of_rows]
+        self._position += len(rows)
+        return tuple(zip(*rows))
+
+    def Close(self):
+        pass
+
+class fake_do_cmd():
+    '''Emulates DoCmd by tracking which modules and forms are open.'''
+
+    def __init__(self,application):
+        self._application = application
+
+    def OpenModule(self,module_name = None,procedure_name = None):
+        self._application.Modules.Append(self._application._database['modules'][module_name])
+
+    def OpenForm(self,form_name,view = 0,*args):
+        self._application.Forms.Append(self._application._database['forms'][form_name])
+
+    def Close(self,object_type = None,object_name = None,save = None):
+        collection = self._application.Forms if object_type == 2 else self._application.Modules
+        if object_name in collection._items: collection.Delete(object_name)
+
+    def RunCommand(self,command):
+        # 58 is acCmdClose, which closes the active (i.e. last opened) form.
+        if command == 58 and len(self._application.Forms):
+            self._application.Forms.Delete(list(self._application.Forms._items)[-1])
+
+class fake_access_application():
+    '''Emulates Access.Application on top of a fixture loaded by OpenCurrentDatabase. Objects can be created through
+    the VBE and DAO as well; the changes are saved to a JSON fixture when the database is closed.'''
+
+    def __init__(self):
+        self.Visible = False
+        self.UserControl = True
+        self.Modules = fake_collection()
+        self.Forms = fake_collection()
+        self.DoCmd = fake_do_cmd(self)
+        self.CurrentProject = None
+        self.CurrentData = None
+        self.VBE = None
+        self._database = None
+        self._currentdb = None
+        self._table_rows = {}
+        self._saved_texts = {}
+        self._path = None
+        self._loaded_fixture = None
+        self._loaded_entries = None
+        self._transaction_fixture = None
+
+        # DBEngine.Workspaces(0) only offers the transaction methods.
+        workspace = fake_object(Name = '#Default Workspace#',BeginTrans = self._begin_transaction,CommitTrans = self._commit_transaction,Rollback = self._rollback)
+        self.DBEngine = fake_object(Workspaces = fake_collection([workspace]))
+
+    def NewCurrentDatabase(self,filepath,*arguments):
+        '''Creates an empty JSON fixture and opens it.'''
+        with open(file = filepath,mode = 'w') as file:
+            json.dump({},file)
+        self.OpenCurrentDatabase(filepath)
+
+    def OpenCurrentDatabase(self,filepath,exclusive = False,password = None):
+        '''Loads the fixture and builds the object model from it.'''
+
+        fixture = self._load_json_fixture(filepath) if os.path.isfile(filepath) else self._load_directory_fixture(filepath)
+        self._path = os.path.abspath(filepath)
+        fake_access_backend.running_applications[self._path] = self
+        self._build(fixture)
+
+    def _build(self,fixture):
+        '''Builds the object model from a fixture.'''
+
+        def _access_object(entry):
+            '''Builds the AccessObject that describes an entry of the fixture.'''
+            return fake_object(Name = entry['name'],DateModified = entry.get('date_modified',''))
+
+        modules = [fake_module(entry['name'],entry.get('type',0),entry.get('code','')) for entry in fixture.get('modules',[])]
+        forms = [
+            fake_object(
+                Name = entry['name'],
+                HasModule = entry.get('code') is not None,
+                Module = fake_module('Form_' + entry['name'],1,entry.get('code'))
+            ) for entry in fixture.get('forms',[])
+        ]
+        query_defs = [fake_object(Name = entry['name'],SQL = entry.get('sql')) for entry in fixture.get('queries',[])]
+        def _table_attributes(entry):
+            '''Returns the Attributes of a TableDef: the ones in the fixture or, for a linked table, dbAttachedODBC or dbAttachedTable.'''
+            if 'attributes' in entry: return entry['attributes']
+            if not entry.get('connect'): return 0
+            return 536870912 if entry['connect'].upper().startswith('ODBC') else 1073741824
+
+        table_defs = [
+            fake_object(
+                Name = entry['name'],
+                Attributes = _table_attributes(entry),
+                Connect = entry.get('connect',''),
+                SourceTableName = entry.get('source_table_name',''),
+                Fields = fake_collection(
+                    fake_object(
+                        Name = field['name'],
+                        Type = field.get('type',10),
+                        Required = field.get('required',False),
+                        Size = field.get('size',255),
+                        AllowZeroLength = field.get('allow_zero_length',False)
+                    ) for field in entry.get('fields',[])
+                ),
+                Indexes = fake_collection(
+                    fake_object(
+                        Name = index['name'],
+                        Primary = index.get('primary',False),
+                        Unique = index.get('unique',False),
+                        Fields = fake_collection(
+                            fake_object(Name = field['name'],Attributes = 1 if field.get('descending') else 0) for field in index.get('fields',[])
+                        )
+                    ) for index in entry.get('indexes',[])
+                )
+            ) for entry in fixture.get('tables',[])
+        ]
+        relations = [
+            fake_object(
+                Name = entry['name'],
+                Table = entry['table'],
+                ForeignTable = entry['foreign_table'],
+                Attributes = entry.get('attributes',0),
+                Fields = fake_collection(fake_object(Name = field['name'],ForeignName = field['foreign_name']) for field in entry.get('fields',[]))
+            ) for entry in fixture.get('relations',[])
+        ]
+
+        self._database = {'modules' : fake_collection(modules), 'forms' : fake_collection(forms)}
+        self._table_rows = {entry['name'] : entry.get('rows',[]) for entry in fixture.get('tables',[])}
+
+        # The VBA project holds one component per standard/class module and per form that has a module.
+        components = [fake_object(Name = module.Name,Type = 1 if module.Type == 0 else 2,CodeModule = module) for module in modules]
+        components += [fake_object(Name = form.Module.Name,Type = 100,CodeModule = form.Module) for form in forms if form.HasModule]
+        self.VBE = fake_object(ActiveVBProject = fake_object(VBComponents = fake_vb_components(components),Saved = True))
+        self._currentdb = fake_object(
+            QueryDefs = fake_collection(query_defs),
+            TableDefs = fake_collection(table_defs),
+            Relations = fake_collection(relations),
+            OpenRecordset = self._open_recordset,
+            CreateQueryDef = self._create_query_def,
+            CreateTableDef = self._create_table_def,
+            CreateRelation = self._create_relation,
+            Close = lambda: None
+        )
+        self.CurrentProject = fake_object(
+            FullName = self._path,
+            AllModules = fake_collection(_access_object(entry) for entry in fixture.get('modules',[])),
+            AllForms = fake_collection(_access_object(entry) for entry in fixture.get('forms',[])),
+            AllReports = fake_collection(_access_object(entry) for entry in fixture.get('reports',[])),
+            AllMacros = fake_collection(_access_object(entry) for entry in fixture.get('macros',[]))
+        )
+
+        # What SaveAsText writes for each form (2), report (3) and macro (4).
+        self._saved_texts = {
+            (object_type,entry['name']) : entry.get('text') or self._made_up_text(object_type,entry)
+            for object_type,kind in [(2,'forms'),(3,'reports'),(4,'macros')] for entry in fixture.get(kind,[])
+        }
+        self.CurrentData = fake_object(
+            AllQueries = fake_collection(_access_object(entry) for entry in fixture.get('queries',[])),
+            AllTables = fake_collection(_access_object(entry) for entry in fixture.get('tables',[]))
+        )
+
+        # What was loaded, to tell on closing whether anything changed (and which objects get a new DateModified).
+        self._loaded_fixture = fixture
+        self._loaded_entries = self._entries()
+
+    def _entries(self):
+        '''Returns the modules, queries, tables and relations of the object model as fixture entries (without dates).'''
+
+        def _table_entry(table_def):
+            '''Returns the fixture entry of a TableDef.'''
+            entry = {
+                'name' : table_def.Name,
+                'fields' : [{'name' : field.Name, 'type' : field.Type, 'required' : field.Required, 'size' : field.Size,
+                             'allow_zero_length' : field.AllowZeroLength} for field in table_def.Fields],
+                'indexes' : [{'name' : index.Name, 'primary' : index.Primary, 'unique' : index.Unique,
+                              'fields' : [{'name' : field.Name, 'descending' : field.Attributes & 1 != 0} for field in index.Fields]}
+                             for index in table_def.Indexes]
+            }
+            if table_def.Connect:
+                entry.update(connect = table_def.Connect,source_table_name = table_def.SourceTableName)
+            elif table_def.Attributes:
+                entry['attributes'] = table_def.Attributes
+            if self._table_rows.get(table_def.Name): entry['rows'] = self._table_rows[table_def.Name]
+            return entry
+
+        components = self.VBE.ActiveVBProject.VBComponents
+        return {
+            'modules' : [{'name' : component.Name, 'type' : 0 if component.Type == 1 else 1,
+                          'code' : component.CodeModule.Lines(1,component.CodeModule.CountOfLines)} for component in components if component.Type != 100],
+            'queries' : [{'name' : query_def.Name, 'sql' : query_def.SQL} for query_def in self._currentdb.QueryDefs],
+            'tables' : [_table_entry(table_def) for table_def in self._currentdb.TableDefs],
+            'relations' : [{'name' : relation.Name, 'table' : relation.Table, 'foreign_table' : relation.ForeignTable, 'attributes' : relation.Attributes,
+                            'fields' : [{'name' : field.Name, 'foreign_name' : field.ForeignName} for field in relation.Fields]}
+                           for relation in self._currentdb.Relations]
+        }
+
+    def _fixture(self):
+        '''Returns the fixture of the database as it is now. Objects that changed since it was loaded get a new DateModified.'''
+
+        fixture = {kind : self._loaded_fixture.get(kind,[]) for kind in ['forms','reports','macros']}
+        now = str(datetime.datetime.now())
+        for kind,entries in self._entries().items():
+            loaded_entries = {entry['name'] : entry for entry in self._loaded_entries[kind]}
+            loaded_dates = {entry['name'] : entry.get('date_modified','') for entry in self._loaded_fixture.get(kind,[])}
+            fixture[kind] = [entry if kind == 'relations' else dict(entry,date_modified = loaded_dates.get(entry['name'],'') if loaded_entries.get(entry['name']) == entry else now)
+                             for entry in entries]
+        return fixture
+
+    def _create_query_def(self,name,sql = ''):
+        '''Emulates Database.CreateQueryDef, which appends a named QueryDef right away.'''
+        query_def = fake_object(Name = name,SQL = sql)
+        self._currentdb.QueryDefs.Append(query_def)
+        return query_def
+
+    @staticmethod
+    def _create_table_def(name):
+        '''Emulates Database.CreateTableDef: the TableDef (and its fields and indexes) have to be appended to be created.'''
+
+        def _create_index(index_name):
+            '''Emulates TableDef.CreateIndex.'''
+            return fake_object(Name = index_name,Primary = False,Unique = False,Fields = fake_collection(),
+                               CreateField = lambda field_name: fake_object(Name = field_name,Attributes = 0))
+
+        return fake_object(
+            Name = name,
+            Attributes = 0,
+            Connect = '',
+            SourceTableName = '',
+            Fields = fake_collection(),
+            Indexes = fake_collection(),
+            CreateField = lambda field_name,field_type = 10,size = 0: fake_object(Name = field_name,Type = field_type,Size = size,Required = False,AllowZeroLength = False),
+            CreateIndex = _create_index
+        )
+
+    @staticmethod
+    def _create_relation(name,table,foreign_table,attributes = 0):
+        '''Emulates Database.CreateRelation.'''
+        return fake_object(Name = name,Table = table,ForeignTable = foreign_table,Attributes = attributes,Fields = fake_collection(),
+                           CreateField = lambda field_name: fake_object(Name = field_name,ForeignName = ''))
+
+    def _begin_transaction(self):
+        self._transaction_fixture = self._fixture()
+
+    def _commit_transaction(self,option = None):
+        self._transaction_fixture = None
+
+    def _rollback(self):
+        loaded_fixture,loaded_entries = self._loaded_fixture,self._loaded_entries
+        self._build(self._transaction_fixture)
+        self._loaded_fixture,self._loaded_entries,self._transaction_fixture = loaded_fixture,loaded_entries,None
+
+    def CurrentDb(self):
+        return self._currentdb
+
+    def CloseCurrentDatabase(self):
+        # Like Access, keep what was created or changed; a directory fixture is only ever read.
+        if self._currentdb is not None and os.path.isfile(self._path) and self._entries() != self._loaded_entries:
+            with open(file = self._path,mode = 'w',encoding = 'utf-8') as file:
+                json.dump(self._fixture(),file,indent = 2)
+        fake_access_backend.running_applications.pop(self._path,None)
+        self.Modules = fake_collection()
+        self.Forms = fake_collection()
+        self._database = None
+        self._currentdb = None
+
+    def Quit(self,option = None):
+        pass
+
+    def SaveAsText(self,object_type,object_name,file_name):
+        # Like Access, write UTF-16 with a byte order mark.
+        with open(file = file_name,mode = 'w',encoding = 'utf-16',newline = '') as file:
+            file.write(self._saved_texts[(object_type,object_name)])
+
+    @staticmethod
+    def _made_up_text(object_type,entry):
+        '''Returns a minimal SaveAsText definition of a form, report or macro of the fixture.'''
+
+        if object_type == 4:
+            lines = ['Version =196611','ColumnsShown =0','Begin','    Action ="Beep"','End']
+        else:
+            lines = ['Version =20','VersionRequired =20','Checksum =' + str(len(entry['name']) * 7919),
+                     'Begin ' + ('Form' if object_type == 2 else 'Report'),'    Caption ="' + entry['name'] + '"','End']
+            if entry.get('code'): lines += ['CodeBehindForm'] + entry['code'].replace('\r\n','\n').split('\n')
+        return '\r\n'.join(lines) + '\r\n'
+
+    def _open_recordset(self,source,recordset_type = None,options = None):
+        '''Emulates Database.OpenRecordset for the queries the exporter runs against the system tables.'''
+
+        if re.match(r'SELECT Name, Connect, Database, ForeignName FROM MSysObjects WHERE Type IN \(4, 6\)',source):
+            rows = []
+            for table_def in self._currentdb.TableDefs:
+                if not table_def.Connect: continue
+
+                # Like Access, a table linked to another Access file keeps the file in Database rather than in Connect.
+                if table_def.Attributes & 536870912:
+                    rows += [(table_def.Name,table_def.Connect,None,table_def.SourceTableName)]
+                else:
+                    connect,_,database = table_def.Connect.partition(';DATABASE=')
+                    rows += [(table_def.Name,connect,database,table_def.SourceTableName)]
+            return fake_recordset(rows)
+
+        table_query = re.match(r'SELECT (.+) FROM \[(.+?)\](?: ORDER BY (.+))?$',source)
+        if table_query and table_query.group(2) in self._table_rows:
+            field_names = [field.Name for field in self._currentdb.TableDefs(table_query.group(2)).Fields]
+            rows = [dict(zip(field_names,row)) for row in self._table_rows[table_query.group(2)]]
+            for column in reversed(re.findall(r'\[(.+?)\]',table_query.group(3) or '')):
+                rows.sort(key = lambda row: (row[column] is not None,row[column]))
+            columns = re.findall(r'\[(.+?)\]',table_query.group(1))
+            return fake_recordset(tuple(row[column] for column in columns) for row in rows)
+
+        raise Exception('The fake backend cannot run "' + source + '".')
+
+    @staticmethod
+    def _load_json_fixture(filepath):
+        '''Reads a JSON fixture.'''
+        with open(file = filepath,mode = 'r') as file:
+            return json.load(file)
+
+    @staticmethod
+    def _load_directory_fixture(directory_path):
+        '''Reads a fixture laid out like the git_exports directory.'''
+
+        fixture = {'modules' : [], 'forms' : [], 'reports' : [], 'macros' : [], 'queries' : [], 'tables' : []}
+
+        def _entries(subdirectory):
+            '''Yields the name, extension, contents and modification time of every file in a subdirectory.'''
+            subdirectory_path = os.path.join(directory_path,subdirectory)
+            file_names = sorted(os.listdir(subdirectory_path)) if os.path.isdir(subdirectory_path) else []
+            for file_name in file_names:
+                full_name = os.path.join(subdirectory_path,file_name)
+                with open(file = full_name,mode = 'r',encoding = 'utf-8') as file:
+                    contents = file.read()
+                name,extension = os.path.splitext(file_name)
+                yield name,extension,contents,str(os.path.getmtime(full_name))
+
+        for name,extension,code,date_modified in _entries('modules'):
+            if extension == '.cls' and name.startswith('Form_'):
+                fixture['forms'] += [{'name' : name[len('Form_'):], 'code' : code, 'date_modified' : date_modified}]
+            else:
+                fixture['modules'] += [{'name' : name, 'type' : 0 if extension == '.bas' else 1, 'code' : code, 'date_modified' : date_modified}]
+
+        # The forms saved as text are merged with the ones whose modules were exported.
+        forms = {entry['name'] : entry for entry in fixture['forms']}
+        for name,extension,text,date_modified in _entries('forms'):
+            forms.setdefault(name,{'name' : name, 'code' : None, 'date_modified' : date_modified})['text'] = text
+        fixture['forms'] = list(forms.values())
+
+        for kind in ['reports','macros']:
+            for name,extension,text,date_modified in _entries(kind):
+                fixture[kind] += [{'name' : name, 'text' : text, 'date_modified' : date_modified}]
+
+        for name,extension,sql,date_modified in _entries('queries'):
+            fixture['queries'] += [{'name' : name, 'sql' : sql, 'date_modified' : date_modified}]
+
+        relations = {}
+        for name,extension,table_json,date_modified in _entries('tables'):
+            table = json.loads(table_json)
+            entry = {'name' : name, 'fields' : table.get('fields',[]), 'indexes' : table.get('indexes',[]), 'date_modified' : date_modified}
+            if 'connect' in table: entry.update(connect = table['connect'],source_table_name = table.get('source_table_name',''))
+            fixture['tables'] += [entry]
+
+            # Every relation is written to the files of both of its tables.
+            relations.update((relation['name'],relation) for relation in table.get('relations',[]))
+
+        fixture['relations'] = list(relations.values())
+        return fixture
+
+class export_profiler():
+    '''Collects how long each phase of an export (and each object inside a phase) takes, and reports it as JSON.'''
+
+    def __init__(self):
+        self.enabled = False
+        self.current_phase = None
+
+        # Steps can be timed by several writer threads at once.
+        self._lock = threading.Lock()
+        self._phases = []
+        self._phases_by_name = {}
+        self._started = None
+
+    def reset(self):
+        '''Forgets the timings of a previous export.'''
+        self._phases = []
+        self._phases_by_name = {}
+        self._started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self,phase_name):
+        '''Times a whole phase of the export (e.g. opening the database or saving the modules).'''
+
+        # The current phase is kept even when nothing is timed, so the COM calls can always be counted per phase.
+        previous_phase,self.current_phase = self.current_phase,phase_name
+        try:
+            if not self.enabled:
+                yield
+                return
+
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._phase(phase_name)['seconds'] += time.perf_counter() - started
+        finally:
+            self.current_phase = previous_phase
+
+    @contextlib.contextmanager
+    def work(self,phase_name):
+        '''Times work done for a phase by another thread (e.g. a writer saving a record while the miners move on). The
+        time of every thread is added up, so a phase worked on by several threads can take more seconds than the export.'''
+
+        if not self.enabled:
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._phase(phase_name)['seconds'] += elapsed
+
+    @contextlib.contextmanager
+    def step(self,phase_name,object_name,step_name):
+        '''Times one step (e.g. open, mine or close) performed on one object during a phase.'''
+
+        if not self.enabled:
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                phase = self._phase(phase_name)
+                phase['steps'][step_name] = phase['steps'].get(step_name,0.0) + elapsed
+                phase['per_object'].setdefault(object_name,{})[step_name] = elapsed
+
+    def _phase(self,phase_name):
+        '''Returns the record of a phase, creating it the first time the phase is seen.'''
+
+        if phase_name not in self._phases_by_name:
+            self._phases_by_name[phase_name] = {'name' : phase_name, 'seconds' : 0.0, 'steps' : {}, 'per_object' : {}}
+            self._phases += [self._phases_by_name[phase_name]]
+        return self._phases_by_name[phase_name]
+
+    def report(self,**details):
+        '''Returns the collected timings (and any details describing the export) as a JSON serializable dictionary.'''
+
+        def _phase_report(phase):
+            '''Summarizes a phase, including its throughput in objects per second.'''
+            object_count = len(phase['per_object'])
+            return {
+                'name' : phase['name'],
+                'seconds' : phase['seconds'],
+                'objects' : object_count,
+                'objects_per_second' : object_count / phase['seconds'] if phase['seconds'] > 0 else None,
+                'steps' : phase['steps'],
+                'per_object' : [dict(name = name,**steps) for name,steps in phase['per_object'].items()]
+            }
+
+        report = dict(details)
+        report['total_seconds'] = time.perf_counter() - self._started if self._started is not None else 0.0
+        report['phases'] = [_phase_report(phase) for phase in self._phases]
+        return report
+
+    def save(self,report_path,**details):
+        '''Writes the report to a JSON file.'''
+        with open(file = report_path,mode = 'w') as file:
+            json.dump(self.report(**details),file,indent = 2)
+
+class com_call_layer():
+    '''Central wrapper every COM call of an export goes through. It retries the calls Access rejects while it is busy,
+    ends the calls that hang past a timeout and counts the calls (and the time spent in them) per method and per phase,
+    so a profile shows how many round-trips each phase costs.'''
+
+    # RPC_E_CALL_REJECTED and RPC_E_SERVERCALL_RETRYLATER: Access is busy (e.g. still loading) and the call can be made again.
+    transient_errors = (-2147418111,-2147417846)
+
+    def __init__(self,phase_of = None,timeout = 300,attempts = 10,backoff = 0.1,max_backoff = 5.0):
+        self.phase_of = phase_of
+        self.timeout = timeout
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.terminated = False
+        self._process_id = None
+        self._call_path = None
+        self._call_started = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+        self._methods = {}
+        self._phases = {}
+
+    def wrap(self,application,process_id = None):
+        '''Returns the application wrapped so that everything read from it goes through the layer. A call that hangs can
+        only be ended by terminating Access, so a process id is only to be given for an instance the export may end.'''
+
+        if isinstance(application,com_proxy): return application
+        self._process_id = process_id
+        if process_id is not None and self.timeout and (self._watchdog is None or not self._watchdog.is_alive()):
+            # A layer can be stopped and wrap another instance later (a watchdog that was stopped, or that terminated the
+            # previous instance, is done), so every watchdog gets its own stop event.
+            self.terminated = False
+            self._stopped = threading.Event()
+            self._watchdog = threading.Thread(target = self._watch_calls,args = (self._stopped,),daemon = True)
+            self._watchdog.start()
+        return com_proxy(self,application,'Application')
+
+    def stop(self):
+        '''Stops watching the calls for timeouts.'''
+        self._stopped.set()
+        self._watchdog = None
+
+    def call(self,path,function,*arguments,**keyword_arguments):
+        '''Makes a COM call, retrying it with an exponential backoff while Access is busy, and records it under the path.'''
+
+        # Objects handed to a call (e.g. a Field appended to a TableDef) are passed as the COM objects they stand in for.
+        arguments = [argument._target if isinstance(argument,com_proxy) else argument for argument in arguments]
+        value,elapsed,retries = self._attempt(path,function,arguments,keyword_arguments)
+        self._record(path,elapsed,retries)
+        return value
+
+    def read(self,path,target,name):
+        '''Reads an attribute of a COM object. Looking up a method isn't a round-trip of its own (calling it is), so it isn't
+        recorded.'''
+        value,elapsed,retries = self._attempt(path,getattr,(target,name),{})
+        if not isinstance(value,com_proxy.method_types): self._record(path,elapsed,retries)
+        return value
+
+    def _attempt(self,path,function,arguments,keyword_arguments):
+        '''Makes the call until it succeeds, fails for good or runs out of attempts. Returns the value, the seconds the call
+        took and the number of retries.'''
+
+        retries = 0
+        started = time.perf_counter()
+        self._call_path,self._call_started = path,started
+        try:
+            while True:
+                try:
+                    return (function(*arguments,**keyword_arguments),time.perf_counter() - started,retries)
+                except Exception as exception:
+                    if self.terminated:
+                        raise TimeoutError('The COM call ' + path + ' did not return within ' + str(self.timeout) + ' seconds, so MS Access was terminated.') from exception
+                    if retries + 1 >= self.attempts or not self._is_transient(exception): raise
+                    time.sleep(min(self.backoff * 2 ** retries,self.max_backoff))
+                    retries += 1
+        finally:
+            self._call_started = None
+
+    def _is_transient(self,exception):
+        '''Returns true if the error means Access was busy rather than that the call failed. Otherwise false.'''
+
+        # A com_error carries its HRESULT first and, for errors raised by Access itself, the SCODE in its excepinfo.
+        arguments = getattr(exception,'args',())
+        if arguments and arguments[0] in self.transient_errors: return True
+        excepinfo = arguments[2] if len(arguments) > 2 else None
+        return isinstance(excepinfo,tuple) and len(excepinfo) > 5 and excepinfo[5] in self.transient_errors
+
+    def _record(self,path,elapsed,retries):
+        '''Adds a call to the statistics of its method and of the current phase.'''
+
+        method = self._methods.get(path)
+        if method is None: method = self._methods[path] = [0,0.0,0]
+        method[0] += 1
+        method[1] += elapsed
+        method[2] += retries
+
+        phase_name = self.phase_of() if self.phase_of is not None else None
+        phase = self._phases.get(phase_name)
+        if phase is None: phase = self._phases[phase_name] = [0,0.0]
+        phase[0] += 1
+        phase[1] += elapsed
+
+    def _watch_calls(self,stopped):
+        '''Terminates Access if a call takes longer than the timeout, until the layer is stopped. A hung COM call can't be
+        cancelled from the calling thread, but it fails (and the layer raises a TimeoutError) as soon as the process is gone.'''
+
+        while not stopped.wait(min(1.0,self.timeout / 4)):
+            started = self._call_started
+            if started is None or time.perf_counter() - started <= self.timeout: continue
+            print('The COM call ' + str(self._call_path) + ' hung for more than ' + str(self.timeout) + ' seconds. Terminating MS Access...')
+            self.terminated = True
+            try:
+                os.kill(self._process_id,signal.SIGTERM)
+            except OSError:
+                pass
+            return
+
+    def report(self):
+        '''Returns the call counts and latencies (overall, per phase and per method, slowest first) as a JSON serializable dictionary.'''
+
+        methods = sorted(self._methods.items(),key = lambda item: item[1][1],reverse = True)
+        return {
+            'calls' : sum(method[0] for method in self._methods.values()),
+            'seconds' : sum(method[1] for method in self._methods.values()),
+            'retries' : sum(method[2] for method in self._methods.values()),
+            'timed_out' : self.terminated,
+            'phases' : [{'name' : name, 'calls' : calls, 'seconds' : seconds} for name,(calls,seconds) in self._phases.items()],
+            'methods' : [{'method' : path, 'calls' : calls, 'seconds' : seconds, 'mean_seconds' : seconds / calls, 'retries' : retries}
+                         for path,(calls,seconds,retries) in methods]
+        }
+
+class com_proxy():
+    '''Stands in for a COM object (or collection) and routes every property read, property write, method call, item
+    lookup and iteration made on it through a com_call_layer, wrapping the objects they return in turn. The objects read
+    from a property are resolved once and then reused, so walking e.g. Application.DoCmd or Application.Forms in a loop
+    costs one round-trip per call instead of one per step of the path.'''
+
+    method_types = (types.MethodType,types.FunctionType,types.BuiltinFunctionType)
+    value_types = (str,int,float,bool,bytes,bytearray,memoryview,tuple,list,dict,datetime.datetime,datetime.date,decimal.Decimal,type(None))
+
+    def __init__(self,layer,target,path):
+        object.__setattr__(self,'_layer',layer)
+        object.__setattr__(self,'_target',target)
+        object.__setattr__(self,'_path',path)
+        object.__setattr__(self,'_resolved',{})
+
+    def _wrapped(self,value,path):
+        '''Wraps a returned COM object in a proxy. Plain values are returned as they are.'''
+        return value if isinstance(value,self.value_types) else com_proxy(self._layer,value,path)
+
+    def __getattr__(self,name):
+        resolved = self._resolved.get(name)
+        if resolved is not None: return resolved
+
+        path = self._path + '.' + name
+        value = self._layer.read(path,self._target,name)
+
+        # Values can change between reads, so only methods and objects are kept.
+        if isinstance(value,self.method_types):
+            resolved = self._method(value,path + '()')
+        elif not isinstance(value,self.value_types):
+            resolved = com_proxy(self._layer,value,path)
+        else:
+            return value
+        self._resolved[name] = resolved
+        return resolved
+
+    def _method(self,method,path):
+        '''Returns a callable making the method call through the layer.'''
+
+        def _call(*arguments,**keyword_arguments):
+            '''Calls the method and wraps what it returns.'''
+            return self._wrapped(self._layer.call(path,method,*arguments,**keyword_arguments),path)
+
+        return _call
+
+    def __setattr__(self,name,value):
+        self._resolved.pop(name,None)
+        self._layer.call(self._path + '.' + name + '=',setattr,self._target,name,value)
+
+    def __call__(self,*arguments):
+        path = self._path + '()'
+        return self._wrapped(self._layer.call(path,self._target,*arguments),path)
+
+    def __getitem__(self,index):
+        path = self._path + '[]'
+        return self._wrapped(self._layer.call(path,self._target.__getitem__,index),path)
+
+    def __iter__(self):
+        path = self._path + '[]'
+        iterator = self._layer.call(path,iter,self._target)
+        while True:
+            try:
+                item = self._layer.call(path,next,iterator)
+            except StopIteration:
+                return
+            yield self._wrapped(item,path)
+
+class sql_formatter():
+    '''In-process pretty printer for Access (Jet) SQL: a tokenizer followed by a layout engine that puts every clause
+    on its own line, indents its contents and breaks lists and conditions one item per line. Results are memoized by
+    the hash of the SQL and can be kept in an on-disk cache between runs.'''
+
+    # Bump the version whenever the layout changes so cached results of the old layout are thrown away.
+    version = 3
+
+    # The most results kept in the on-disk cache; the ones used least recently are dropped first.
+    cache_size_limit = 20000
+
+    keywords = {
+        'ALL','ALTER','AND','ANY','AS','ASC','BETWEEN','BY','CREATE','DELETE','DESC','DISTINCT','DISTINCTROW','DROP',
+        'EQV','EXISTS','FALSE','FROM','FULL','GROUP','HAVING','IMP','IN','INDEX','INNER','INSERT','INTO','IS','JOIN',
+        'LEFT','LIKE','MOD','NOT','NULL','ON','OPTION','OR','ORDER','OUTER','OWNERACCESS','PARAMETERS','PERCENT','PIVOT',
+        'RIGHT','SELECT','SET','SOME','TABLE','TOP','TRANSFORM','TRUE','UNION','UPDATE','VALUES','WHERE','WITH','XOR'
+    }
+
+    # Keywords (or keyword sequences) that start a new clause on a line of their own.
+    clauses = {
+        'SELECT','FROM','WHERE','GROUP BY','HAVING','ORDER BY','UNION','UNION ALL','PARAMETERS','TRANSFORM','PIVOT',
+        'INSERT INTO','INTO','VALUES','UPDATE','SET','DELETE','WITH OWNERACCESS OPTION'
+    }
+
+    # Words that stay on the line of the clause they modify (e.g. SELECT DISTINCT TOP 10).
+    clause_modifiers = {'DISTINCT','DISTINCTROW','TOP','PERCENT'}
+
+    joins = {'JOIN','INNER JOIN','LEFT JOIN','RIGHT JOIN','FULL JOIN','LEFT OUTER JOIN','RIGHT OUTER JOIN','FULL OUTER JOIN'}
+
+    # Keywords that are also the names of functions: followed by a parenthesis they are a function call (LEFT(x, 3)).
+    # Their string versions (LEFT$, RIGHT$) are never keywords.
+    function_keywords = {'LEFT','RIGHT'}
+
+    # Keyword sequences that are laid out as one keyword, keyed by their first word (longest sequences first).
+    multi_word_keywords = {
+        'WITH' : [('WITH','OWNERACCESS','OPTION')],
+        'LEFT' : [('LEFT','OUTER','JOIN'),('LEFT','JOIN')],
+        'RIGHT' : [('RIGHT','OUTER','JOIN'),('RIGHT','JOIN')],
+        'FULL' : [('FULL','OUTER','JOIN'),('FULL','JOIN')],
+        'GROUP' : [('GROUP','BY')],
+        'ORDER' : [('ORDER','BY')],
+        'INSERT' : [('INSERT','INTO')],
+        'UNION' : [('UNION','ALL')],
+        'INNER' : [('INNER','JOIN')]
+    }
+
+    # Strings, [bracketed] names, #dates#, numbers, words (with the $ of the string functions like Left$ and Format$), two
+    # character operators and any other single character.
+    _token_pattern = re.compile(r'''
+        '[^']*(?:''[^']*)*'|"[^"]*(?:""[^"]*)*"
+        |\[[^\]]*\]
+        |\#[^\#]*\#
+        |\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+
+        |[^\W\d]\w*\$?
+        |<>|<=|>=
+        |\S
+        ''',re.VERBOSE)
+
+    def __init__(self,indent = '  '):
+        self.indent = indent
+        self._formatted = {}
+        self._cache_is_dirty = False
+
+    def format(self,sql):
+        '''Returns the pretty printed SQL, reusing the result of an earlier call (or run) for the same SQL.'''
+
+        if not sql: return sql
+
+        # Every result used is moved to the end, so the cache is ordered from least to most recently used.
+        sql_hash = hashlib.sha1(sql.encode('utf-8')).hexdigest()
+        formatted = self._formatted.pop(sql_hash,None)
+        if formatted is None:
+            formatted = self._layout(self._tokens(sql))
+            self._cache_is_dirty = True
+        self._formatted[sql_hash] = formatted
+        return formatted
+
+    def load_cache(self,cache_path):
+        '''Loads the results kept by a previous run (if they were made by the same version of the layout).'''
+
+        try:
+            with open(file = cache_path,mode = 'r') as file:
+                cache = json.load(file)
+        except (OSError,ValueError):
+            cache = {}
+
+        if cache.get('version') == self.version: self._formatted.update(cache.get('formatted',{}))
+
+    def save_cache(self,cache_path):
+        '''Keeps the results for the next run (only if anything new was formatted).'''
+
+        if self._cache_is_dirty:
+            for sql_hash in list(itertools.islice(self._formatted,max(0,len(self._formatted) - self.cache_size_limit))):
+                del self._formatted[sql_hash]
+            with open(file = cache_path,mode = 'w') as file:
+                json.dump({'version' : self.version, 'formatted' : self._formatted},file)
+            self._cache_is_dirty = False
+
+    def _tokens(self,sql):
+        '''Splits the SQL into (kind,text) tokens, dropping whitespace, upper casing keywords and joining multi-word
+        keywords into a single token.'''
+
+        tokens = []
+        previous_text = ''
+        texts = self._token_pattern.findall(sql)
+        for position,text in enumerate(texts):
+
+            # The first character tells what kind of token it is.
+            first_character = text[0]
+            if first_character.isalpha() or first_character == '_':
+                kind = 'word'
+
+                # Keywords are upper cased, unless they are used as the name of a field (e.g. Table.Option) or of a function.
+                if previous_text not in ('.','!'):
+                    upper_text = text.upper()
+                    next_text = texts[position + 1] if position + 1 < len(texts) else ''
+                    if upper_text in self.keywords and not (upper_text in self.function_keywords and next_text == '('):
+                        kind,text = 'keyword',upper_text
+            elif first_character.isdigit() or (first_character == '.' and len(text) > 1):
+                kind = 'number'
+            elif first_character in ('\'','"'):
+                kind = 'string'
+            elif first_character == '[':
+                kind = 'bracketed'
+            elif first_character == '#' and len(text) > 1:
+                kind = 'date'
+            elif first_character in '=<>+-*/&^\\':
+                kind = 'operator'
+            else:
+                kind = 'punctuation'
+
+            tokens.append((kind,text))
+            previous_text = text
+
+        merged = []
+        position = 0
+        while position < len(tokens):
+            kind,text = tokens[position]
+            for words in (self.multi_word_keywords.get(text,()) if kind == 'keyword' else ()):
+                if tuple(text for kind,text in tokens[position:position + len(words)]) == words:
+                    merged += [('keyword',' '.join(words))]
+                    position += len(words)
+                    break
+            else:
+                merged += [tokens[position]]
+                position += 1
+        return merged
+
+    def _layout(self,tokens):
+        '''Lays the tokens out over indented lines.'''
+
+        lines = []
+        line = []
+        line_indent = 0
+
+        # Every subquery has its own context: the indent of its clauses, the clause being laid out and how many ordinary
+        # (non-subquery) parentheses are open inside it.
+        contexts = [{'base' : 0, 'clause' : None, 'depth' : 0}]
+        after_clause = False
+        between_pending = False
+
+        def _new_line(indent):
+            '''Ends the current line and starts a new one at the given indent level.'''
+            nonlocal line,line_indent
+            if line: lines.append(self.indent * line_indent + ''.join(line))
+            line = []
+            line_indent = indent
+
+        def _append(kind,text):
+            '''Appends a token to the current line, spacing it from the previous one where appropriate.'''
+            nonlocal previous
+            if line and _needs_space(previous[0],previous[1],kind,text): line.append(' ')
+            line.append(text)
+            previous = (kind,text)
+
+        def _needs_space(previous_kind,previous_text,kind,text):
+            '''Decides whether a space separates two tokens.'''
+            if previous_text in ('(','.','!') or text in (')',',',';','.','!'): return False
+
+            # Function calls hug their parentheses (Count(*), Nz(x, 0)), keywords and the columns of an INSERT INTO
+            # don't (IN (1, 2), INSERT INTO Table1 (Field1)).
+            if text == '(' and previous_kind in ('word','bracketed') and contexts[-1]['clause'] != 'INSERT INTO': return False
+
+            # Unary signs hug their operand.
+            return previous_kind != 'unary'
+
+        previous = ('punctuation','')
+        for index,(kind,text) in enumerate(tokens):
+            context = contexts[-1]
+            content_indent = context['base'] + 1
+
+            if kind == 'keyword' and text in self.clauses and context['depth'] == 0:
+                _new_line(context['base'])
+                _append(kind,text)
+                context['clause'] = text
+                after_clause = True
+                continue
+
+            if after_clause and ((kind == 'keyword' and text in self.clause_modifiers) or (kind == 'number' and previous[1] == 'TOP')):
+                _append(kind,text)
+                continue
+
+            if after_clause and text != ';':
+                _new_line(content_indent)
+            after_clause = False
+
+            if kind == 'keyword' and text in self.joins:
+                _new_line(content_indent)
+                _append(kind,text)
+
+            elif kind == 'keyword' and text in ('AND','OR') and context['depth'] == 0 and not (text == 'AND' and between_pending):
+                _new_line(content_indent)
+                _append(kind,text)
+
+            elif text == '(':
+                _append(kind,text)
+                next_token = tokens[index + 1] if index + 1 < len(tokens) else None
+                if next_token == ('keyword','SELECT'):
+                    contexts.append({'base' : content_indent + 1, 'clause' : None, 'depth' : 0})
+                else:
+                    context['depth'] += 1
+
+            elif text == ')':
+                if context['depth'] > 0:
+                    context['depth'] -= 1
+                    _append(kind,text)
+                elif len(contexts) > 1:
+                    contexts.pop()
+                    _new_line(contexts[-1]['base'] + 1)
+                    _append(kind,text)
+                else:
+                    _append(kind,text)
+
+            elif text == ',' and context['depth'] == 0 and context['clause'] not in (None,'PARAMETERS'):
+                _append(kind,text)
+                _new_line(content_indent)
+
+            elif kind == 'operator' and text in ('-','+') and (previous[0] in ('operator','keyword') or previous[1] in ('(',',','')):
+                _append('unary',text)
+
+            else:
+                _append(kind,text)
+
+            if kind == 'keyword' and text == 'BETWEEN': between_pending = True
+            elif kind == 'keyword' and text == 'AND': between_pending = False
+
+        _new_line(0)
+        return '\r\n'.join(lines)
+
+class object_index():
+    '''Cross-reference index of the exported objects, kept in an SQLite file so dependency lookups never read the
+    exported files. It records every object (kind, name and content hash), the procedures declared in VBA, and the
+    references each object makes: tables and queries named in SQL (of queries, record sources and SQL strings in VBA),
+    procedures called in VBA, forms referenced as Forms!name, subforms and the names quoted in VBA and macros.'''
+
+    # Bump the version whenever what is extracted changes, so an index built by an older version is rebuilt.
+    version = 1
+
+    # The index is kept in the cache directory of the exports directory.
+    file_name = 'index.sqlite'
+
+    # Statement keywords of VBA that start a statement but are never a call.
+    _vba_keywords = {
+        'call','case','const','debug','declare','dim','do','each','else','elseif','end','enum','erase','exit','for','function',
+        'get','global','gosub','goto','if','let','loop','me','next','on','option','private','property','public','redim','resume',
+        'return','select','set','static','stop','sub','then','type','wend','while','with'
+    }
+
+    _vba_string_pattern = re.compile(r'"(?:[^"\n]|"")*"')
+    _vba_continuation_pattern = re.compile(r' _[ \t]*\n')
+    _vba_literal_pattern = re.compile(r'"(?:[^"\n]|"")*"(?:[ \t]*&[ \t]*"(?:[^"\n]|"")*")*|\'.*$',re.MULTILINE)
+    _vba_call_pattern = re.compile(r'(?<!\w)([A-Za-z_]\w*|\[[^\]]*\])\s*\(')
+    _vba_call_statement_pattern = re.compile(r'\bCall[ \t]+([A-Za-z_][\w.]*)',re.IGNORECASE)
+    # The VBA editor capitalizes keywords, so Then and Else are matched as they are written.
+    _vba_statement_start_pattern = re.compile(r'(?:^|:|(?<!\w)(?:Then|Else)\b)[ \t]*([A-Za-z_][\w.]*)[ \t]*(=)?',re.MULTILINE)
+    _vba_form_reference_pattern = re.compile(r'\b(?:Forms|Reports)\]?!(\[[^\]]*\]|\w+)',re.IGNORECASE)
+    _vba_declaration_pattern = re.compile(r'''^[ \t]*(?:(Public|Private|Friend|Global)[ \t]+)?(?:Static[ \t]+)?(?:Declare[ \t]+(?:PtrSafe[ \t]+)?)?
+                                               (Sub|Function|Property[ \t]+(?:Get|Let|Set))[ \t]+([A-Za-z_]\w*).*$''',re.VERBOSE | re.IGNORECASE | re.MULTILINE)
+    _sql_start_pattern = re.compile(r'\s*(SELECT|UPDATE|INSERT|DELETE|TRANSFORM|PARAMETERS)\b',re.IGNORECASE)
+    _quoted_name_pattern = re.compile(r'[\w][\w \-]{0,63}$')
+
+    def __init__(self,index_path):
+        self.index_path = index_path
+        self._sql_formatter = sql_formatter()
+        self.connection = sqlite3.connect(index_path)
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != self.version:
+            for table_name in ['objects','refs','procs']: self.connection.execute('DROP TABLE IF EXISTS ' + table_name)
+            self.connection.execute('PRAGMA user_version = ' + str(self.version))
+
+        # Access names are case insensitive, and so are the lookups.
+        self.connection.execute('CREATE TABLE IF NOT EXISTS objects (path TEXT PRIMARY KEY, kind TEXT, name TEXT COLLATE NOCASE, hash TEXT)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS refs (path TEXT, target TEXT COLLATE NOCASE, kind TEXT)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS procs (path TEXT, name TEXT COLLATE NOCASE, kind TEXT, private INTEGER, line INTEGER)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS objects_by_name ON objects (name)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS refs_by_target ON refs (target)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS refs_by_path ON refs (path)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS procs_by_name ON procs (name)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS procs_by_path ON procs (path)')
+
+    def close(self):
+        '''Stores the index and closes it.'''
+        self.connection.commit()
+        self.connection.close()
+
+    def update(self,export_directory_path,manifest):
+        '''Indexes the files of the manifest whose hash changed since the last update and forgets the ones that are gone.
+        Returns the number of files indexed.'''
+
+        indexed_hashes = dict(self.connection.execute('SELECT path, hash FROM objects').fetchall())
+        files = {relative_name : entry for relative_name,entry in manifest.items() if entry['kind'] != 'table_data'}
+
+        for relative_name in indexed_hashes.keys() - files.keys(): self._forget(relative_name)
+
+        indexed_count = 0
+        for relative_name,entry in files.items():
+            if indexed_hashes.get(relative_name) == entry['hash']: continue
+            try:
+                with open(file = os.path.join(export_directory_path,*relative_name.split('/')),mode = 'r',encoding = 'utf-8') as file:
+                    content = file.read()
+            except (OSError,ValueError):
+                continue
+
+            references,procedures = self._extracted(entry['kind'],content)
+            self._forget(relative_name)
+            self.connection.execute('INSERT INTO objects VALUES (?, ?, ?, ?)',(relative_name,entry['kind'],entry['name'],entry['hash']))
+            self.connection.executemany('INSERT INTO refs VALUES (?, ?, ?)',((relative_name,target,kind) for target,kind in references))
+            self.connection.executemany('INSERT INTO procs VALUES (?, ?, ?, ?, ?)',((relative_name,) + procedure for procedure in procedures))
+            indexed_count += 1
+        return indexed_count
+
+    def _forget(self,relative_name):
+        '''Removes a file and what was extracted from it.'''
+        for table_name in ['objects','refs','procs']: self.connection.execute('DELETE FROM ' + table_name + ' WHERE path = ?',(relative_name,))
+
+    def uses(self,name):
+        '''Returns the objects and public procedures the objects with the name (and the module of a form or report with
+        the name) refer to, as (kind,name,path) rows.'''
+        return self.connection.execute('''
+            SELECT DISTINCT target.kind, target.name, target.path FROM objects source
+            JOIN refs ON refs.path = source.path
+            JOIN objects target ON target.name = refs.target AND target.path != source.path AND target.kind != 'table_data'
+            WHERE source.name IN (?, 'Form_' || ?, 'Report_' || ?)
+            UNION
+            SELECT DISTINCT 'procedure', procs.name, procs.path FROM objects source
+            JOIN refs ON refs.path = source.path AND refs.kind = 'call'
+            JOIN procs ON procs.name = refs.target AND procs.path != source.path AND NOT procs.private
+            WHERE source.name IN (?, 'Form_' || ?, 'Report_' || ?)
+            ORDER BY 1, 2''',(name,) * 6).fetchall()
+
+    def used_by(self,name):
+        '''Returns the objects referring to an object or procedure with the name, as (kind,name,path,reference kind) rows.'''
+        return self.connection.execute('''
+            SELECT DISTINCT objects.kind, objects.name, objects.path, refs.kind FROM refs
+            JOIN objects ON objects.path = refs.path
+            WHERE refs.target = ? AND objects.name != ?
+            ORDER BY 1, 2, 4''',(name,name)).fetchall()
+
+    def defines(self,name):
+        '''Returns where procedures with the name are declared, as (path,line,kind,private) rows.'''
+        return self.connection.execute('SELECT path, line, kind, private FROM procs WHERE name = ? ORDER BY path',(name,)).fetchall()
+
+    def _extracted(self,kind,content):
+        '''Returns the references ((target,kind) pairs) and procedure declarations ((name,kind,private,line) tuples) of a file.'''
+
+        if kind == 'query': return self._sql_references(content,'source'),[]
+        if kind == 'module': return self._vba_references(content)
+        if kind in ['form','report','macro']: return self._text_references(content),[]
+        if kind == 'table':
+            table = json.loads(content)
+            return sorted({(name,'relation') for relation in table.get('relations',[]) for name in [relation['table'],relation['foreign_table']]} - {(table.get('name'),'relation')}),[]
+        return [],[]
+
+    def _sql_references(self,sql,source_kind):
+        '''Returns the tables and queries a SQL statement reads or writes, the functions it calls and the forms it refers
+        to (as [Forms]![name]![control]).'''
+
+        source_keywords = {'FROM','UPDATE','INTO','INSERT INTO','TABLE'} | self._sql_formatter.joins
+        tokens = self._sql_formatter._tokens(sql)
+        references = set()
+        expecting_source = False
+        depth = 0
+
+        # The parenthesis depths at which a FROM clause is open, where a comma introduces another source.
+        from_depths = set()
+        for position,(kind,text) in enumerate(tokens):
+            next_text = tokens[position + 1][1] if position + 1 < len(tokens) else ''
+            if kind == 'keyword':
+                expecting_source = text in source_keywords
+                if text == 'FROM':
+                    from_depths.add(depth)
+                elif text in self._sql_formatter.clauses or text == 'ON':
+                    from_depths.discard(depth)
+            elif kind in ['word','bracketed']:
+                name = text[1:-1] if kind == 'bracketed' else text
+                previous_text = tokens[position - 1][1] if position else ''
+                if previous_text == '!' and position > 1 and tokens[position - 2][1].strip('[]').upper() in ['FORMS','REPORTS']:
+                    references.add((name,'form'))
+                elif kind == 'word' and next_text == '(' and previous_text != '.':
+                    references.add((name,'call'))
+                elif expecting_source and next_text != '.':
+                    references.add((name,source_kind))
+                expecting_source = False
+            elif text == '(':
+                depth += 1
+            elif text == ')':
+                from_depths.discard(depth)
+                depth -= 1
+                expecting_source = False
+            elif text == ',':
+                expecting_source = depth in from_depths
+            elif text != '.':
+                expecting_source = False
+        return sorted(references)
+
+    def _vba_references(self,code):
+        '''Returns the references and the procedure declarations of a VBA module. Calls are the names followed by an
+        argument list, named by a Call statement or starting a statement (e.g. "DoSomething arg"). The whole module is
+        searched at once rather than statement by statement.'''
+
+        procedures = []
+        for declaration in self._vba_declaration_pattern.finditer(code):
+            scope,procedure_kind,name = declaration.groups()
+            procedures += [(name,' '.join(procedure_kind.split()).lower(),int((scope or '').lower() == 'private'),code.count('\n',0,declaration.start()) + 1)]
+
+        # Lines continued with " _" are one statement. Strings joined with & (e.g. SQL built over several lines) are read as
+        # one, and the strings and the comments are blanked out of the code that is searched for calls.
+        strings = []
+        def _blanked(match):
+            '''Keeps a string (or strings joined with &) and blanks it out, or drops a comment.'''
+            if match.group().startswith('\''): return ''
+            strings.append(''.join(part[1:-1].replace('""','"') for part in self._vba_string_pattern.findall(match.group())))
+            return '""'
+        statements = self._vba_literal_pattern.sub(_blanked,self._vba_continuation_pattern.sub(' ',code))
+
+        references = set()
+        for value in strings:
+            if self._sql_start_pattern.match(value):
+                references.update(self._sql_references(value,'source'))
+            elif self._quoted_name_pattern.match(value):
+                references.add((value,'string'))
+        if '!' in statements: references.update((name.strip('[]'),'form') for name in self._vba_form_reference_pattern.findall(statements))
+
+        # Statements also start after a colon and after Then/Else (e.g. "If done Then Finish"). Every name of a qualified
+        # call starting a statement (e.g. "Module1.DoSomething arg") is in call position, but an assignment isn't.
+        statements = self._vba_declaration_pattern.sub('',statements)
+        names = [name.strip('[]') for name in self._vba_call_pattern.findall(statements)]
+        if 'all ' in statements: names += [name for qualified_name in self._vba_call_statement_pattern.findall(statements) for name in qualified_name.split('.')]
+        names += [name for qualified_name,assignment in self._vba_statement_start_pattern.findall(statements) if not assignment for name in qualified_name.split('.')]
+        references.update((name,'call') for name in set(names) if name.lower() not in self._vba_keywords)
+        return sorted(references),procedures
+
+    def _text_references(self,text):
+        '''Returns the record sources, row sources and subforms of a form or report saved as text, and the names quoted in
+        the arguments of a macro. The module after CodeBehindForm is indexed with the modules.'''
+
+        references = set()
+        lines = iter(text.split('\n'))
+        for line in lines:
+            stripped_line = line.strip()
+            if stripped_line == 'CodeBehindForm': break
+            property_name,separator,value = stripped_line.partition(' =')
+            if not separator or property_name not in ['RecordSource','RowSource','SourceObject','Argument']: continue
+
+            # Long values are written as a block of quoted lines.
+            value = value.strip()
+            if value == 'Begin':
+                parts = []
+                for block_line in lines:
+                    if block_line.strip() == 'End': break
+                    parts += [block_line.strip()[1:-1]]
+                value = ''.join(parts)
+            elif value.startswith('"') and value.endswith('"'):
+                value = value[1:-1]
+            value = value.replace('""','"')
+            if not value: continue
+
+            if property_name == 'SourceObject':
+                references.add((value.split('.',1)[-1],'subform'))
+            elif property_name == 'Argument':
+                if self._quoted_name_pattern.match(value): references.add((value,'string'))
+            elif self._sql_start_pattern.match(value):
+                references.update(self._sql_references(value,'record_source'))
+            else:
+                references.add((value,'record_source'))
+        return sorted(references)
+
+class file_lock():
+    '''Exclusive lock held through a lock file, so only one process at a time works on what it guards. The lock is taken
+    with the operating system's file locking (rather than by creating the file), so it is released when its process
+    dies and a crash never leaves it stuck.'''
+
+    def __init__(self,lock_path,timeout = 600,waiting_message = None):
+        self.lock_path = lock_path
+        self.timeout = timeout
+        self.waiting_message = waiting_message
+        self._file = None
+
+    def acquire(self):
+        '''Waits (up to the timeout) until the lock is free and takes it.'''
+
+        self._file = open(file = self.lock_path,mode = 'a+')
+        started = time.perf_counter()
+        waiting = False
+        while not self._try_lock():
+            if time.perf_counter() - started > self.timeout:
+                self._file.close()
+                self._file = None
+                raise TimeoutError('"' + self.lock_path + '" was still locked after ' + str(self.timeout) + ' seconds.')
+            if not waiting and self.waiting_message: print(self.waiting_message)
+            waiting = True
+            time.sleep(0.1)
+
+    def release(self):
+        '''Releases the lock (if it is held).'''
+
+        if self._file is None: return
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(),msvcrt.LK_UNLCK,1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(),fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _try_lock(self):
+        '''Takes the lock if it is free and returns true. Otherwise false.'''
+
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(),msvcrt.LK_NBLCK,1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(),fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self,exception_type,exception,traceback):
+        self.release()
+
+class snapshot_pack():
+    '''Single-file archive of exports: a zip holding every exported file once, under the hash of its content
+    (objects/<hash>), and a snapshot per export (snapshots/<name>.json) mapping the files of the export to their
+    hashes. Files that are the same in several snapshots (or several databases) are only stored once, and any file of
+    any snapshot can be read on its own through the zip's central directory.'''
+
+    def __init__(self,pack_path):
+        self.pack_path = os.path.abspath(pack_path)
+
+        # Appending overwrites the central directory at the end of the pack, so it is kept here until the append is done.
+        self._journal_path = self.pack_path + '.journal'
+
+    @staticmethod
+    def is_valid_name(snapshot_name):
+        '''Returns true if the name can be given to a snapshot (it can't point anywhere else in the pack). Otherwise false.'''
+        return bool(snapshot_name) and not any(text in snapshot_name for text in ['/','\\','..'])
+
+    def snapshot_names(self):
+        '''Returns the names of the snapshots in the pack.'''
+        if not os.path.exists(self.pack_path): return []
+        with zipfile.ZipFile(self.pack_path) as pack:
+            return sorted(member[len('snapshots/'):-len('.json')] for member in pack.namelist() if member.startswith('snapshots/'))
+
+    def snapshot(self,snapshot_name):
+        '''Returns a snapshot: its name, details (database and date) and files.'''
+        with zipfile.ZipFile(self.pack_path) as pack:
+            return json.loads(pack.read(self._snapshot_member(snapshot_name)).decode('utf-8'))
+
+    def add_snapshot(self,snapshot_name,export_directory_path,manifest,**details):
+        '''Adds the files of an export (listed by its manifest, whose hashes are the hashes of the files) as a snapshot,
+        storing only the files the pack doesn't hold yet. The new files are appended in place, so the cost doesn't grow
+        with the pack, and an append that is interrupted is undone by the next one. Returns the number of new objects stored.'''
+
+        if not self.is_valid_name(snapshot_name): raise ValueError('"' + snapshot_name + '" is not a valid snapshot name.')
+
+        def _append(pack):
+            '''Appends the new objects and the snapshot to an open pack and returns the number of new objects.'''
+
+            members = set(pack.namelist())
+            if self._snapshot_member(snapshot_name) in members:
+                raise FileExistsError('The pack already has a snapshot named "' + snapshot_name + '".')
+
+            new_object_count = 0
+            for relative_name,entry in sorted(manifest.items()):
+                member = 'objects/' + entry['hash']
+                if member in members: continue
+                pack.write(os.path.join(export_directory_path,*relative_name.split('/')),member)
+                members.add(member)
+                new_object_count += 1
+
+            snapshot = dict(details,name = snapshot_name,files = manifest)
+            pack.writestr(self._snapshot_member(snapshot_name),json.dumps(snapshot,indent = 2,sort_keys = True))
+            return new_object_count
+
+        with self._locked():
+            self._undo_interrupted_append()
+
+            # A new pack is written next to where it goes and moved there once it is complete.
+            if not os.path.exists(self.pack_path):
+                temporary_path = self.pack_path + '.tmp'
+                with zipfile.ZipFile(temporary_path,mode = 'w',compression = zipfile.ZIP_DEFLATED) as pack:
+                    new_object_count = _append(pack)
+                self._fsync(temporary_path)
+                os.replace(temporary_path,self.pack_path)
+                return new_object_count
+
+            # The central directory (and the end record after it) is all an append overwrites, so it is journaled first.
+            with zipfile.ZipFile(self.pack_path) as pack:
+                central_directory_offset = pack.start_dir
+            with open(file = self.pack_path,mode = 'rb') as file:
+                file.seek(central_directory_offset)
+                central_directory = file.read()
+            with open(file = self._journal_path,mode = 'wb') as file:
+                file.write(str(central_directory_offset).encode('ascii') + b'\n' + central_directory)
+                file.flush()
+                os.fsync(file.fileno())
+
+            try:
+                with zipfile.ZipFile(self.pack_path,mode = 'a',compression = zipfile.ZIP_DEFLATED) as pack:
+                    new_object_count = _append(pack)
+                self._fsync(self.pack_path)
+            except BaseException:
+                self._undo_interrupted_append()
+                raise
+            os.remove(self._journal_path)
+        return new_object_count
+
+    def read(self,snapshot_name,relative_name):
+        '''Returns the content of one file of a snapshot, decompressing nothing else.'''
+
+        with zipfile.ZipFile(self.pack_path) as pack:
+            files = json.loads(pack.read(self._snapshot_member(snapshot_name)).decode('utf-8'))['files']
+            if relative_name not in files: raise KeyError('The snapshot "' + snapshot_name + '" has no file "' + relative_name + '".')
+            return pack.read('objects/' + files[relative_name]['hash'])
+
+    def unpack(self,snapshot_name,directory_path):
+        '''Writes the files of a snapshot (and its manifest) to a directory laid out like git_exports. Returns the number
+        of files written.'''
+
+        with zipfile.ZipFile(self.pack_path) as pack:
+            files = json.loads(pack.read(self._snapshot_member(snapshot_name)).decode('utf-8'))['files']
+            for relative_name,entry in files.items():
+                # The names come from the archive, so none may point outside the directory.
+                if relative_name.startswith('/') or '..' in relative_name.split('/') or ':' in relative_name:
+                    raise ValueError('Refusing to unpack "' + relative_name + '" outside of the directory.')
+                full_name = os.path.join(directory_path,*relative_name.split('/'))
+                os.makedirs(os.path.dirname(full_name),exist_ok = True)
+                with pack.open('objects/' + entry['hash']) as source,open(file = full_name,mode = 'wb') as file:
+                    shutil.copyfileobj(source,file)
+
+        with open(file = os.path.join(directory_path,'manifest.json'),mode = 'w',encoding = 'utf-8',newline = '') as file:
+            file.write(json.dumps(files,indent = 2,sort_keys = True))
+        return len(files)
+
+    def _undo_interrupted_append(self):
+        '''Puts back the pack as it was before an append that didn't finish (if there was one), dropping what it appended.'''
+
+        if not os.path.exists(self._journal_path): return
+        with open(file = self._journal_path,mode = 'rb') as file:
+            central_directory_offset,_,central_directory = file.read().partition(b'\n')
+        if central_directory:
+            with open(file = self.pack_path,mode = 'r+b') as file:
+                file.truncate(int(central_directory_offset))
+                file.seek(int(central_directory_offset))
+                file.write(central_directory)
+                file.flush()
+                os.fsync(file.fileno())
+        os.remove(self._journal_path)
+
+    @staticmethod
+    def _fsync(path):
+        '''Flushes a file to disk.'''
+        with open(file = path,mode = 'rb+') as file:
+            os.fsync(file.fileno())
+
+    @staticmethod
+    def _snapshot_member(snapshot_name):
+        '''Returns the name of the member holding a snapshot.'''
+        return 'snapshots/' + snapshot_name + '.json'
+
+    def _locked(self):
+        '''Returns the lock of the pack, so the exports of a batch can add their snapshots to the same pack one at a time.'''
+        return file_lock(self.pack_path + '.lock')
+
+class export_location():
+    '''Where the files and caches of an export are written.'''
+
+    @property
+    def export_directory_path(self):
+        '''Returns the exports directory: the one that was requested or otherwise git_exports next to the database.'''
+        if self.requested_export_directory_path:
+            return os.path.abspath(self.requested_export_directory_path)
+        return os.path.join(os.path.abspath(os.path.dirname(self.db_path)),'git_exports')
+
+    @property
+    def cache_directory_path(self):
+        '''Returns the path of the directory (inside the exports directory) that holds the caches kept between runs.'''
+        return os.path.join(self.export_directory_path,'.cache')
+
+    def __init__(self):
+        self.requested_export_directory_path = None
+
+    def ensure_cache_directory_exists(self):
+        '''Creates the cache directory. The caches are only useful to this machine, so they are kept out of git.'''
+
+        if not os.path.exists(self.cache_directory_path):
+            os.makedirs(self.cache_directory_path)
+            with open(file = os.path.join(self.cache_directory_path,'.gitignore'),mode = 'w') as file:
+                file.write('*\n')
+
+class table_data_selection():
+    '''Which tables have their rows exported, how many rows at most and in what format.'''
+
+    def __init__(self,include = ('*',),exclude = (),row_limits = (),file_format = 'csv',chunk_size = 1000):
+        # Patterns are globs matched without regard to case, like Access names. Row limits are (pattern,rows) pairs and
+        # when several of them match a table the last one wins.
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.row_limits = [list(row_limit) for row_limit in row_limits]
+        self.file_format = file_format
+        self.chunk_size = chunk_size
+
+    def selects(self,table_name):
+        '''Returns true if the rows of the table are to be exported. Otherwise false.'''
+        return self._matches(table_name,self.include) and not self._matches(table_name,self.exclude)
+
+    def row_limit(self,table_name):
+        '''Returns the most rows exported from the table or None if there is no limit.'''
+        rows = None
+        for pattern,limit in self.row_limits:
+            if self._matches(table_name,[pattern]): rows = limit
+        return rows
+
+    @staticmethod
+    def _matches(table_name,patterns):
+        '''Returns true if the name matches any of the patterns. Otherwise false.'''
+        return any(fnmatch.fnmatchcase(table_name.lower(),pattern.lower()) for pattern in patterns)
+
+class object_filter():
+    '''Which objects an export looks at: the kinds of object and the names (globs or regular expressions) to include or exclude.'''
+
+    all_kinds = ['tables','modules','forms','queries','reports','macros']
+
+    def __init__(self,kinds = None,include = (),exclude = ()):
+        # Patterns look like [KIND:]GLOB or [KIND:]re:REGEX and are matched without regard to case, like Access names. An
+        # object is selected if its kind is, it matches an include pattern (when there are any) and no exclude pattern.
+        self.kinds = list(kinds) if kinds else list(object_filter.all_kinds)
+        self.include = list(include)
+        self.exclude = list(exclude)
+
+    def selects(self,kind,name):
+        '''Returns true if the export looks at the object. Otherwise false.'''
+        return (kind in self.kinds and (not self.include or self._matches(kind,name,self.include)) and
+                not self._matches(kind,name,self.exclude))
+
+    @staticmethod
+    def _matches(kind,name,patterns):
+        '''Returns true if the object matches any of the patterns. Otherwise false.'''
+
+        for pattern in patterns:
+            pattern_kind,separator,name_pattern = pattern.partition(':')
+            if not separator or pattern_kind not in object_filter.all_kinds:
+                pattern_kind,name_pattern = None,pattern
+            if pattern_kind is not None and pattern_kind != kind: continue
+
+            if name_pattern.startswith('re:'):
+                if re.search(name_pattern[len('re:'):],name,re.IGNORECASE): return True
+            elif fnmatch.fnmatchcase(name.lower(),name_pattern.lower()):
+                return True
+        return False
+
+class ms_access_automation(export_location):
     '''Object that uses COM to communicate with MS Access to get all the code from its modules and tabulate it in a python list.'''
 
+    # Bumped whenever the data mined from a TableDef changes shape, so tables cached by an older version are mined again.
+    table_schema_version = 2
+
     @property
     def currentdb(self):
         '''gets a reference to the current database (if it is not already obtained) otherwise returns the existing reference.'''
         self._currentdb = self.ac.CurrentDb() if self._currentdb is None else self._currentdb
         return self._currentdb
 
+    @property
+    def object_dates(self):
+        '''Returns the DateModified of every module, form, query and table (keyed by kind and then by name) using a single metadata pass.'''
+
+        def _dates_of(access_objects):
+            '''Reads the name and DateModified of every AccessObject in a collection.'''
+            return {access_object.Name : str(access_object.DateModified) for access_object in access_objects}
+
+        if self._object_dates is None:
+            self._object_dates = {
+                'modules' : _dates_of(self.ac.CurrentProject.AllModules),
+                'forms' : _dates_of(self.ac.CurrentProject.AllForms),
+                'queries' : _dates_of(self.ac.CurrentData.AllQueries),
+                'tables' : _dates_of(self.ac.CurrentData.AllTables)
+            }
+
+            # Reports and macros are only looked at when they are saved as text. Form definitions share the forms' dates.
+            if self.save_as_text:
+                self._object_dates['reports'] = _dates_of(self.ac.CurrentProject.AllReports)
+                self._object_dates['macros'] = _dates_of(self.ac.CurrentProject.AllMacros)
+                self._object_dates['form_texts'] = self._object_dates['forms']
+        return self._object_dates
+
+    @property
+    def vbe_components(self):
+        '''Returns the components of the VBA project keyed by name, enumerating them only once. Returns None if the VBA
+        project can't be read.'''
+
+        if not self._vbe_components_read:
+            self._vbe_components_read = True
+            try:
+                self._vbe_components = {component.Name : component for component in self.ac.VBE.ActiveVBProject.VBComponents}
+            except Exception:
+                self._vbe_components = None
+        return self._vbe_components
+
     @property
     def module_names(self):
         '''Returns all the module names in the current project, and stores them for the next time they are needed.'''
-        self._module_names = [module.Name for module in self.ac.CurrentProject.AllModules] if self._module_names is None else self._module_names
+        self._module_names = list(self.object_dates['modules']) if self._module_names is None else self._module_names
         return self._module_names
 
     @property
@@ -33,7 +1790,7 @@ class ms_access_automation():
     @property
     def form_names(self):
         '''Returns all the form names in the current project, and stores them for the next time they are needed.'''
-        self._form_names = [form.Name for form in self.ac.CurrentProject.AllForms] if self._form_names is None else self._form_names
+        self._form_names = list(self.object_dates['forms']) if self._form_names is None else self._form_names
         return self._form_names
 
     @property
@@ -51,10 +1808,20 @@ class ms_access_automation():
         
         return p_form_modules
 
+    @property
+    def report_names(self):
+        '''Returns all the report names in the current project.'''
+        return list(self.object_dates['reports'])
+
+    @property
+    def macro_names(self):
+        '''Returns all the macro names in the current project.'''
+        return list(self.object_dates['macros'])
+
     @property
     def query_names(self):
         '''Returns all the QueryDef names in the current project, and stores them for the next time they are needed.'''
-        self._query_names = [query.Name for query in self.ac.CurrentData.AllQueries] if self._query_names is None else self._query_names
+        self._query_names = list(self.object_dates['queries']) if self._query_names is None else self._query_names
         return self._query_names
 
     @property
@@ -65,7 +1832,7 @@ class ms_access_automation():
     @property
     def table_names(self):
         '''Returns all the TableDef names in the current project, and stores them for the next time they are needed.'''
-        self._table_names = [table.Name for table in self.ac.CurrentData.AllTables] if self._table_names is None else self._table_names
+        self._table_names = list(self.object_dates['tables']) if self._table_names is None else self._table_names
         return self._table_names
 
     @property
@@ -73,12 +1840,168 @@ class ms_access_automation():
         '''Alias for the TableDefs object.'''
         return self.currentdb.TableDefs
 
+    @property
+    def table_def_references(self):
+        '''Returns every TableDef keyed by name, resolved in a single pass over TableDefs and kept for the rest of the run.'''
+        self._table_def_references = {table_def.Name : table_def for table_def in self.table_defs} if self._table_def_references is None else self._table_def_references
+        return self._table_def_references
+
+    @property
+    def linked_table_sources(self):
+        '''Returns the connect string and source table of every linked table keyed by name, read in bulk from MSysObjects.
+        Returns None if MSysObjects can't be read, in which case the TableDefs are asked instead.'''
+
+        if not self._linked_table_sources_read:
+            self._linked_table_sources_read = True
+            try:
+                # 4 = dbOpenSnapshot. Type 4 is a table linked through ODBC and type 6 a table linked to another file.
+                recordset = self.currentdb.OpenRecordset('SELECT Name, Connect, Database, ForeignName FROM MSysObjects WHERE Type IN (4, 6)',4)
+                rows = []
+                while not recordset.EOF:
+                    rows += list(zip(*recordset.GetRows(1000)))
+                recordset.Close()
+            except Exception:
+                self._linked_table_sources = None
+            else:
+                self._linked_table_sources = {}
+                for name,connect,database,foreign_name in rows:
+                    # Tables linked to another Access file keep the path in Database, but the TableDef's Connect has it.
+                    connect = connect or ''
+                    if database and 'DATABASE=' not in connect.upper():
+                        connect = connect.rstrip(';') + ';DATABASE=' + database
+                    self._linked_table_sources[name] = (connect,foreign_name or '')
+        return self._linked_table_sources
+
+    @property
+    def table_relations(self):
+        '''Returns the relations of every table (the ones it is on either side of) keyed by table name, read in a single pass
+        over the database's Relations.'''
+
+        if self._table_relations is None:
+            self._table_relations = {}
+            for relation in self.currentdb.Relations:
+                relation_data = {
+                    'name' : relation.Name,
+                    'table' : relation.Table,
+                    'foreign_table' : relation.ForeignTable,
+                    'attributes' : relation.Attributes,
+                    'fields' : [{'name' : field.Name, 'foreign_name' : field.ForeignName} for field in relation.Fields]
+                }
+                for table_name in {relation_data['table'],relation_data['foreign_table']}:
+                    self._table_relations.setdefault(table_name,[]).append(relation_data)
+        return self._table_relations
+
     def run(self,displaying_prompts = True):
         '''Runs the automation. Displays console prompts by default but can be silent.'''
+
+        def _open_mining_cache():
+            '''Opens the cache of the objects mined by previous runs, emptying it if a full re-mine was requested or the
+            options differ. The cache is an SQLite file so entries are read and written one at a time, never all at once.'''
+
+            self.ensure_cache_directory_exists()
+
+            # The JSON file that held the cache before it moved to SQLite is never read again.
+            with contextlib.suppress(OSError): os.remove(os.path.join(self.cache_directory_path,'mining_cache.json'))
+
+            self._mining_cache_path = os.path.join(self.cache_directory_path,self._mining_cache_file_name)
+            connection = sqlite3.connect(self._mining_cache_path)
+            connection.execute('CREATE TABLE IF NOT EXISTS options (options TEXT)')
+            connection.execute('CREATE TABLE IF NOT EXISTS objects (kind TEXT, name TEXT, date_modified TEXT, data TEXT, PRIMARY KEY (kind, name))')
+            connection.execute('CREATE TABLE IF NOT EXISTS published (kind TEXT, name TEXT, date_modified TEXT, options TEXT, PRIMARY KEY (kind, name))')
+
+            # Prettified and raw SQL can't be mixed, so a change of options invalidates the whole cache.
+            options = json.dumps(_mining_options(),sort_keys = True)
+            self._mining_options_text = options
+            if self.full_export or connection.execute('SELECT options FROM options').fetchone() != (options,):
+                connection.execute('DELETE FROM objects')
+                connection.execute('DELETE FROM options')
+                connection.execute('INSERT INTO options VALUES (?)',(options,))
+            return connection
+
+        def _mining_options():
+            '''Returns the options that change the mined data and therefore have to match for the cache to be reused.'''
+            return {'pretty_print_sql' : self.pretty_print_sql, 'sql_formatter_version' : sql_formatter.version, 'table_schema_version' : self.table_schema_version}
+
+        def _mine_or_reuse(kind,name,mine):
+            '''Reuses the cached data of an object whose DateModified did not change since the last run, otherwise mines it.'''
+
+            date_modified = self.object_dates[kind][name]
+            cached_entry = mining_cache.execute('SELECT date_modified, data FROM objects WHERE kind = ? AND name = ?',(kind,name)).fetchone()
+
+            if cached_entry is not None and cached_entry[0] == date_modified:
+                with self.profiler.step(kind,name,'reuse'):
+                    data = json.loads(cached_entry[1])
+                    data = tuple(data) if isinstance(data,list) else data
+                if displaying_prompts: print('Reusing "' + name + '" (unchanged).')
+            else:
+                if displaying_prompts: print('Mining "' + name + '" for data...', end=" ")
+                data = mine(name)
+                if displaying_prompts: print('Done!!!')
+                mining_cache.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)',(kind,name,date_modified,json.dumps(data)))
+
+            return data
+
+        def _close_mining_cache():
+            '''Forgets the objects that no longer exist and stores the cache for the next run.'''
+
+            # Objects this export didn't look at (filtered out or unchanged) still exist, so they stay cached.
+            for kind,name in mining_cache.execute('SELECT kind, name FROM objects').fetchall():
+                if name not in self.object_dates.get(kind,{}):
+                    mining_cache.execute('DELETE FROM objects WHERE kind = ? AND name = ?',(kind,name))
+            mining_cache.commit()
+            mining_cache.close()
+
+        def _selected(kind,names_list):
+            '''Returns the names of the objects of a kind this export looks at: the ones the filter selects and, when only
+            changed objects are exported, whose DateModified differs from the one of the last published export (what was
+            only mined, by a verification or an export that failed, doesn't count). Nothing is opened to decide.'''
+
+            filter_kind = 'forms' if kind == 'form_texts' else kind
+            selected_names = []
+            for name in names_list:
+                if not self.object_filter.selects(filter_kind,name): continue
+                if self.changed_only and not self.full_export:
+                    published_entry = mining_cache.execute('SELECT date_modified, options FROM published WHERE kind = ? AND name = ?',(kind,name)).fetchone()
+                    if published_entry == (self.object_dates[kind][name],self._mining_options_text):
+                        self._skipped_objects.add((filter_kind,name))
+                        continue
+                selected_names += [name]
+                self._looked_at_objects += [(kind,name)]
+            return selected_names
+
+        def _emit(records):
+            '''Hands every record a miner yields over to the record sink (or, without one, collects it in the lists).'''
+
+            data_lists = {'table' : self._table_data, 'module' : self._module_data, 'query' : self._query_data, 'text' : self._text_data}
+            for kind,data in records:
+                if kind == 'module': self._module_summary += [(data[0],data[1],data[2] is not None)]
+                if kind == 'query': self._query_summary += [(data[0],data[1] is not None)]
+
+                if self.record_sink is not None:
+                    self.record_sink((kind,data))
+                else:
+                    data_lists[kind] += [data]
         
         def _open_access_file():
-            '''Opens the Access application object to the database of interest, and makes it visible'''
-            self.ac=win32com.client.Dispatch('Access.Application')
+            '''Opens the Access application object (unless a warm one was handed over) to the database of interest, and makes it visible'''
+
+            # An instance someone is working in already has the database open and is left exactly as it is (and is never
+            # terminated, however long a call takes).
+            if self.database_already_open:
+                self.ac = self.com_calls.wrap(self.ac)
+                return
+
+            if self.ac is None:
+                self.ac=self.backend.create_application()
+                self._owns_application = True
+            process_id = self.backend.application_process_id(self.ac)
+            self.ac = self.com_calls.wrap(self.ac,process_id)
+
+            # Access is started by COM rather than by this process, so whoever has to terminate a hung export (a batch run)
+            # finds the instance through this file.
+            if self.process_id_path is not None and process_id is not None and self._owns_application:
+                with open(file = self.process_id_path,mode = 'w') as file:
+                    file.write(str(process_id))
             self.ac.OpenCurrentDatabase(self.db_path)
             self.ac.UserControl=False
             for form in self.forms:
@@ -87,7 +2010,7 @@ class ms_access_automation():
 
         
         def _get_all_table_obj_data():
-            '''Place all the data necessary to create a table into a list.'''
+            '''Yields a record with all the data necessary to create each table.'''
 
             class table_attributes(IntFlag):
                 dbAttachedODBC = 536870912
@@ -97,43 +2020,91 @@ class ms_access_automation():
                 dbHiddenObject = 1
                 dbSystemObject = -2147483646
 
-            def is_system_table():
+            def is_system_table(attributes):
                 '''Determines if a table is a system table and if so returns true. Otherwise false.''' 
-                return (self.table_defs[table_name].Attributes & table_attributes.dbSystemObject != 0)
+                return (attributes & table_attributes.dbSystemObject != 0)
+
+            def is_linked_table(attributes):
+                '''Determines if a table is linked to another database and if so returns true. Otherwise false.'''
+                return (attributes & (table_attributes.dbAttachedTable | table_attributes.dbAttachedODBC) != 0)
 
-            def _next_table_def():
+            def _next_table_def(table_name,table_def,attributes):
                 '''Gets the next record of tabledef related data that will be appended to the list'''
-                
-                def _next_field():
-                    '''Gets the data related to the next field in the tabledef'''
-                    field_obj_data = {
-                        'name' : field.Name,
-                        'type' : field.Type,
-                        'required': field.Required,
-                        'size' : field.Size,
-                        'allow_zero_length' : field.AllowZeroLength
-                    }
-
-                    return field_obj_data
-
-                tabledef_obj_data = {
-                    'name' : table_name,
-                    'fields' : []
-                }
 
-                for field in self.table_defs[table_name].Fields:
-                    tabledef_obj_data['fields'] += [_next_field()]
-                
-                return tabledef_obj_data
+                def _source_of_linked_table():
+                    '''Gets the connect string and source table of a linked table.'''
+                    sources = self.linked_table_sources
+                    return sources[table_name] if sources and table_name in sources else (table_def.Connect,table_def.SourceTableName)
+
+                return self.table_schema(table_name,table_def,_source_of_linked_table() if is_linked_table(attributes) else None)
+
+            def _exports_rows_of(table_data):
+                '''Returns true if the rows of a (local) table are to be exported. Otherwise false.'''
+                return (self.table_data is not None and self.table_data_sink is not None and 'connect' not in table_data and
+                        self.table_data.selects(table_data['name']))
+
+            def _mine_table(table_name):
+                '''Returns the tabledef related data of a table or None if it is a system table.'''
+                with self.profiler.step('tables',table_name,'mine'):
+                    # The TableDef is resolved once and its Attributes read once, however many questions are asked of them.
+                    table_def = self.table_def_references[table_name]
+                    attributes = table_def.Attributes
+                    return None if is_system_table(attributes) else _next_table_def(table_name,table_def,attributes)
+
+            for table_name in _selected('tables',self.table_names):
+                table_data = _mine_or_reuse('tables',table_name,_mine_table)
+
+                # Relations belong to the database rather than to a table (adding one doesn't change the DateModified of its
+                # tables), so they are read for every run in one pass instead of being cached with the table.
+                if table_data is not None: yield ('table',dict(table_data,relations = self.table_relations.get(table_name,[])))
+
+                # Only the schema of the tables whose rows are exported is kept; linked tables are left to their own database.
+                if table_data is not None and _exports_rows_of(table_data): tables_with_row_data.append(table_data)
+
+        def _export_all_table_row_data():
+            '''Streams the rows of every selected table to the table data sink, sorted by primary key, a chunk at a time.'''
+
+            def _is_text_field(field):
+                '''Returns true if the values of the field can be written as text. Otherwise false.'''
+                # 11 = dbLongBinary (OLE object), 101 = dbAttachment and 102 to 109 are the multi-valued (complex) types.
+                return field['type'] != 11 and not 101 <= field['type'] <= 109
+
+            def _is_sortable_field(field):
+                '''Returns true if the rows can be sorted by the field. Otherwise false.'''
+                # 12 = dbMemo.
+                return _is_text_field(field) and field['type'] != 12
+
+            def _rows(table_name,sql,row_limit):
+                '''Yields the rows of the query, reading them through a forward-only snapshot in chunks.'''
 
-            for table_name in self.table_names:
-                if not is_system_table():
-                    if displaying_prompts: print('Mining "' + table_name + '" for data...', end=" ")
-                    self._table_data += [_next_table_def()]
-                    if displaying_prompts: print('Done!!!')
+                # 4 = dbOpenSnapshot and 8 = dbForwardOnly.
+                recordset = self.currentdb.OpenRecordset(sql,4,8)
+                try:
+                    row_count = 0
+                    while not recordset.EOF and (row_limit is None or row_count < row_limit):
+                        chunk_size = self.table_data.chunk_size if row_limit is None else min(self.table_data.chunk_size,row_limit - row_count)
+                        rows = list(zip(*recordset.GetRows(chunk_size)))
+                        row_count += len(rows)
+                        yield from rows
+                    if not recordset.EOF and displaying_prompts: print('Rows of "' + table_name + '" cut off at ' + str(row_limit) + '.')
+                finally:
+                    recordset.Close()
+
+            for table in tables_with_row_data:
+                columns = [field['name'] for field in table['fields'] if _is_text_field(field)]
+                if not columns: continue
+
+                # Without a primary key the rows are sorted by every sortable field so the order is the same on every run.
+                order = table['primary_key'] or [field['name'] for field in table['fields'] if _is_sortable_field(field)]
+                sql = 'SELECT ' + ', '.join('[' + column + ']' for column in columns) + ' FROM [' + table['name'] + ']'
+                if order: sql += ' ORDER BY ' + ', '.join('[' + column + ']' for column in order)
+
+                if displaying_prompts: print('Exporting the rows of "' + table['name'] + '"...', end=" ")
+                self.table_data_sink(table['name'],columns,_rows(table['name'],sql,self.table_data.row_limit(table['name'])))
+                if displaying_prompts: print('Done!!!')
         
         def _get_all_module_obj_data(names_list,obj_list,is_form):
-            '''Place the module names, types and VBA code inside the list of tuples for any given list of module names and module objects.'''
+            '''Yields a record with the module name, type and VBA code for any given list of module names and module objects.'''
                     
             def _open_obj(obj_name):
                 '''Selects and runs the "open" method on the object based on its type.'''
@@ -154,100 +2125,215 @@ class ms_access_automation():
             def _mine_the_object_data(obj_name):
                 '''Gets the necessary data from the object.'''
 
-                def _has_or_is_module(obj_name):
-                    '''Returns the value of HasModule for form objects or true for module objects.'''
-                    return self.forms(obj_name).HasModule if is_form else True
-
                 def _get_module_code(module):
                     '''Obtains the code contained inside a module and returns it as a string.'''
                     return module.Lines(1,module.CountOfLines)
 
-                def _get_module_type(module):
-                    '''Obtains the type of module and returns the int that represents it.'''
-                    return 2 if (is_form and _has_or_is_module(obj_name)) else module.Type
-
-                def _corrected_object_name(name):
-                    '''Corrects the name of the module based on type. (Form modules are always prefaced by "Form_")'''
-                    return 'Form_' + name if is_form else name
-                
-                # If the object is a module or is a for with a module then get its code and type.
-                if _has_or_is_module(obj_name):
-                    code = _get_module_code(obj_list(obj_name))
-                    module_type = _get_module_type(obj_list(obj_name))  
-                else:
-                    code = None
+                # The open form is looked up once and asked for HasModule once; every COM round-trip counts in this loop.
+                if is_form:
+                    form = self.forms(obj_name)
+                    module = form.Module if form.HasModule else None
                     module_type = 2
+                else:
+                    module = obj_list(obj_name)
+                    module_type = module.Type
 
-                # Correct the name if it is a form module and append the data to the list.
+                # If the object is a module or is a form with a module then get its code.
+                code = _get_module_code(module) if module is not None else None
+
+                # Correct the name if it is a form module and return the data.
                 name = _corrected_object_name(obj_name)
-                self._module_data += [(name,module_type,code)]
+                return (name,module_type,code)
+
+            def _mine_from_vbe(obj_name):
+                '''Gets the object's data straight from its component in the VBA project, without opening anything.
+                Returns None if the component can't be resolved.'''
+
+                # VBComponent.Type: 1 = standard module, 2 = class module, 100 = document (form/report) module.
+                vbe_module_types = {1 : 0, 2 : 1, 100 : 2}
+
+                if self.vbe_components is None: return None
+
+                name = _corrected_object_name(obj_name)
+                component = self.vbe_components.get(name)
+
+                # A form without a module (HasModule = False) has no component in the VBA project.
+                if component is None:
+                    return (name,2,None) if is_form else None
+
+                try:
+                    code_module = component.CodeModule
+                    code = code_module.Lines(1,code_module.CountOfLines)
+                    module_type = 2 if is_form else vbe_module_types[component.Type]
+                except Exception:
+                    return None
+                return (name,module_type,code)
+
+            def _mine(obj_name):
+                '''Gets the object's data from the VBA project (if enabled), falling back to opening the object.'''
+
+                if self.read_code_from_vbe:
+                    with self.profiler.step(kind,obj_name,'vbe'):
+                        module_data = _mine_from_vbe(obj_name)
+                    if module_data is not None: return module_data
+
+                return _open_mine_and_close(obj_name)
+
+            def _corrected_object_name(name):
+                '''Corrects the name of the module based on type. (Form modules are always prefaced by "Form_")'''
+                return 'Form_' + name if is_form else name
+
+            def _open_mine_and_close(obj_name):
+                '''Opens the object, gets its data and closes it again.'''
+                with self.profiler.step(kind,obj_name,'open'):
+                    _open_obj(obj_name)
+                with self.profiler.step(kind,obj_name,'mine'):
+                    module_data = _mine_the_object_data(obj_name)
+                with self.profiler.step(kind,obj_name,'close'):
+                    _close_obj(obj_name)
+                return module_data
             
-            # For each module in the list, fetch the VBA code, and module type, and add the data to the list of tuples alongside the name.
+            # For each module in the list, fetch the VBA code, and module type (unless they haven't changed since the last
+            # run), and yield them alongside the name.
+            kind = 'forms' if is_form else 'modules'
             for name in names_list:
-                if displaying_prompts: print('Mining "' + name + '" for data...', end=" ")
-                _open_obj(name)
-                _mine_the_object_data(name)
-                _close_obj(name)
-                if displaying_prompts: print('Done!!!')
+                yield ('module',_mine_or_reuse(kind,name,_mine))
 
             #if displaying prompts then add one new line between the prompts of this portion and the next.
             if displaying_prompts: print('\n',end='')
 
         def _get_all_query_obj_data():
-            '''Place all query names, and SQL inside a list of tuples.'''
+            '''Yields a record with the name and SQL of each query.'''
 
-            for query_name in self.query_names:
-                sql = self.query_defs[query_name].SQL
-                try:
-                    if(not self.pretty_print_sql):
-                        ''' skip to end '''
-                        raise Exception('Prettify disabled')
-                    print('Prettifying: ' + query_name)
-                    sql_urlencoded = quote(sql)
-                    ''' If pretty_print_sql '''
-                    conn = http.client.HTTPSConnection("sql-format.com")
-                    payload = f'text={sql_urlencoded}&options=%7B%7D&caretPosition%5Bx%5D=0&caretPosition%5By%5D=1&saveHistory=false'
-                    headers = {
-                        'Content-Type': 'application/x-www-form-urlencoded'
-                    }
-                    conn.request("POST", "", payload, headers)
-                    res = conn.getresponse()
-                    data = res.read()
-                    response_data = data.decode("utf-8")
-                    response_json = json.loads(response_data)
-                    if(response_json['Text']):
-                        sql = response_json['Text']
-                except Exception:
-                    print('Could not pretty print SQL')
-                except:
-                    print('Could not pretty print SQL')
-                self._query_data += [(query_name,sql)]
+            def _mine_query(query_name):
+                '''Returns the SQL of a query, prettified if requested.'''
+
+                with self.profiler.step('queries',query_name,'mine'):
+                    sql = self.query_defs[query_name].SQL
+
+                if self.pretty_print_sql:
+                    with self.profiler.step('queries',query_name,'format'):
+                        try:
+                            sql = self.sql_formatter.format(sql)
+                        except Exception:
+                            print('Could not pretty print SQL of "' + query_name + '"')
+                return (query_name,sql)
+
+            # Formatted SQL is memoized on disk so unchanged queries are never reformatted.
+            sql_format_cache_path = os.path.join(self.cache_directory_path,'sql_format_cache.json')
+            if self.pretty_print_sql: self.sql_formatter.load_cache(sql_format_cache_path)
+
+            for query_name in _selected('queries',self.query_names):
+                yield ('query',_mine_or_reuse('queries',query_name,_mine_query))
+
+            if self.pretty_print_sql: self.sql_formatter.save_cache(sql_format_cache_path)
+
+        def _get_all_saved_text_obj_data(cache_kind,kind,names_list):
+            '''Yields a record with the definition Access saves as text (SaveAsText) of every form, report or macro.'''
+
+            # The object types of SaveAsText: 2 = acForm, 3 = acReport and 4 = acMacro.
+            object_type = {'form' : 2, 'report' : 3, 'macro' : 4}[kind]
+
+            def _decoded(raw_text):
+                '''Decodes a file written by SaveAsText, which is UTF-16 for forms and reports of .accdb files.'''
+                if raw_text.startswith((b'\xff\xfe',b'\xfe\xff')): return raw_text.decode('utf-16')
+                if raw_text.startswith(b'\xef\xbb\xbf'): return raw_text.decode('utf-8-sig')
+                return raw_text.decode('utf-8',errors = 'replace')
+
+            def _save_as_text(obj_name):
+                '''Has Access save the object to a scratch file in the cache directory and reads it back.'''
+
+                scratch_path = os.path.join(self.cache_directory_path,'save_as_text.tmp')
+                with self.profiler.step(cache_kind,obj_name,'save'):
+                    self.ac.SaveAsText(object_type,obj_name,scratch_path)
+                with open(file = scratch_path,mode = 'rb') as file:
+                    text = _decoded(file.read())
+                os.remove(scratch_path)
+                return (kind,obj_name,text)
+
+            for name in names_list:
+                yield ('text',_mine_or_reuse(cache_kind,name,_save_as_text))
+
+            if displaying_prompts: print('\n',end='')
 
         def _display_prompts():
             '''Prints console prompts to show the developer what was mined.'''
 
-            for module_num,(name,module_type,code) in enumerate(self._module_data):
+            for module_num,(name,module_type,has_code) in enumerate(self._module_summary):
                 print('Module #' + str(module_num + 1) + ': ' + name)
                 print('Type: ' + str(module_type))
-                code = 'Code: No code.' if code is None else 'Code: Obtained!'
+                code = 'Code: Obtained!' if has_code else 'Code: No code.'
                 print(code,end = '\n\n')
 
-            for query_index, query_name in enumerate(self.query_names): 
+            for query_index,(query_name,has_sql) in enumerate(self._query_summary): 
                 print('Query #' + str(query_index + 1) + ': ' + query_name)
-                sql = 'SQL: Empty QueryDef.' if self.query_defs[query_name].SQL is None else 'SQL: Obtained!'
+                sql = 'SQL: Obtained!' if has_sql else 'SQL: Empty QueryDef.'
                 print(sql,end = '\n\n')
 
-        _open_access_file()
-        _get_all_table_obj_data()
-        _get_all_module_obj_data(self.module_names,self.modules,is_form=False)
-        _get_all_module_obj_data(self.form_names,self.form_modules,is_form=True)
-        _get_all_query_obj_data()
+            for kind,count,seconds in self._saved_text_summary:
+                if count == 0: continue
+                print(kind.capitalize() + 's saved as text: ' + str(count) + ' in ' + str(round(seconds,1)) + ' seconds (' +
+                      str(round(count / seconds,1) if seconds else count) + ' objects/sec)')
+
+        self._looked_at_objects = []
+        mining_cache = _open_mining_cache()
+        tables_with_row_data = []
+        try:
+            with self.profiler.phase('open_access_file'): _open_access_file()
+            with self.profiler.phase('object_dates'): self.object_dates
+            with self.profiler.phase('tables'): _emit(_get_all_table_obj_data())
+            with self.profiler.phase('table_data'): _export_all_table_row_data()
+            with self.profiler.phase('modules'): _emit(_get_all_module_obj_data(_selected('modules',self.module_names),self.modules,is_form=False))
+            with self.profiler.phase('forms'): _emit(_get_all_module_obj_data(_selected('forms',self.form_names),self.form_modules,is_form=True))
+            with self.profiler.phase('queries'): _emit(_get_all_query_obj_data())
+            if self.save_as_text:
+                for cache_kind,kind,names_list in [('form_texts','form',self.form_names),('reports','report',self.report_names),('macros','macro',self.macro_names)]:
+                    started = time.perf_counter()
+                    names_list = _selected(cache_kind,names_list)
+                    with self.profiler.phase(cache_kind): _emit(_get_all_saved_text_obj_data(cache_kind,kind,names_list))
+                    self._saved_text_summary += [(kind,len(names_list),time.perf_counter() - started)]
+        except BaseException:
+            # What was mined before the failure is kept, but objects are only forgotten after a complete pass.
+            mining_cache.commit()
+            mining_cache.close()
+            raise
+        finally:
+            self.com_calls.stop()
+        _close_mining_cache()
         if displaying_prompts: _display_prompts()
 
-    def __init__(self):
+    def __init__(self,backend = None,application = None,profiler = None):
 
-        self.ac = None
+        export_location.__init__(self)
+        self.backend = com_access_backend() if backend is None else backend
+        self.profiler = export_profiler() if profiler is None else profiler
+        self.com_calls = com_call_layer(lambda: self.profiler.current_phase)
+        self.sql_formatter = sql_formatter()
+        self.ac = application
+        self._owns_application = False
+        self.process_id_path = None
+        self.pretty_print_sql = False
+        self.full_export = False
+        self.read_code_from_vbe = False
+        self.save_as_text = False
+        self.database_already_open = False
+        self.object_filter = object_filter()
+        self.changed_only = False
+        self._skipped_objects = set()
+        self._looked_at_objects = []
+        self._mining_options_text = None
         self._currentdb = None
+        self._table_def_references = None
+        self._linked_table_sources = None
+        self._linked_table_sources_read = False
+        self._table_relations = None
+        self._object_dates = None
+        self._vbe_components = None
+        self._vbe_components_read = False
+        self._mining_cache_file_name = 'mining_cache.sqlite'
+        self.record_sink = None
+        self.table_data = None
+        self.table_data_sink = None
         self._table_names = None
         self._module_names = None
         self._form_names = None
@@ -256,18 +2342,105 @@ class ms_access_automation():
         self._module_data = []
         self._query_data = []
         self._table_data = []
+        self._text_data = []
+        self._module_summary = []
+        self._query_summary = []
+        self._saved_text_summary = []
+
+    def record_published_dates(self):
+        '''Records the DateModified of every object the last run looked at, once its files are published, so exporting
+        only the changed objects skips them until they change again. Never called when only verifying.'''
+
+        connection = sqlite3.connect(self._mining_cache_path)
+        try:
+            connection.executemany('INSERT OR REPLACE INTO published VALUES (?, ?, ?, ?)',
+                                   [(kind,name,self.object_dates[kind][name],self._mining_options_text) for kind,name in self._looked_at_objects])
+            for kind,name in connection.execute('SELECT kind, name FROM published').fetchall():
+                if name not in self.object_dates.get(kind,{}):
+                    connection.execute('DELETE FROM published WHERE kind = ? AND name = ?',(kind,name))
+            connection.commit()
+        finally:
+            connection.close()
+
+    def in_scope(self,kind,name):
+        '''Returns true if the export looked at the object (the filter selects it and it wasn't skipped as unchanged).
+        Otherwise false.'''
+        return self.object_filter.selects(kind,name) and (kind,name) not in self._skipped_objects
+
+    @staticmethod
+    def table_schema(table_name,table_def,link = None):
+        '''Returns the schema of a TableDef the way it is exported (without its relations). The link of a linked table
+        is its connect string and source table; any password in the connect string is masked.'''
+
+        # Every property is a COM round-trip (five per field). No bulk source (ADO's OpenSchema, ExportXML) reports the DAO
+        # types and AllowZeroLength the files hold, so this is only paid for tables that changed (see the mining cache).
+        def _next_field():
+            '''Gets the data related to the next field in the tabledef'''
+            field_obj_data = {
+                'name' : field.Name,
+                'type' : field.Type,
+                'required': field.Required,
+                'size' : field.Size,
+                'allow_zero_length' : field.AllowZeroLength
+            }
+
+            return field_obj_data
+
+        def _next_index():
+            '''Gets the data related to the next index in the tabledef'''
+
+            # Field.Attributes of an index field: 1 = dbDescending.
+            index_obj_data = {
+                'name' : index.Name,
+                'primary' : index.Primary,
+                'unique' : index.Unique,
+                'fields' : [{'name' : index_field.Name, 'descending' : index_field.Attributes & 1 != 0} for index_field in index.Fields]
+            }
+
+            return index_obj_data
+
+        tabledef_obj_data = {
+            'name' : table_name,
+            'fields' : [],
+            'primary_key' : [],
+            'indexes' : []
+        }
+
+        for field in table_def.Fields:
+            tabledef_obj_data['fields'] += [_next_field()]
+
+        for index in table_def.Indexes:
+            tabledef_obj_data['indexes'] += [_next_index()]
+            if index.Primary: tabledef_obj_data['primary_key'] = [index_field['name'] for index_field in tabledef_obj_data['indexes'][-1]['fields']]
+
+        if link is not None:
+            connect,source_table_name = link
+            tabledef_obj_data['connect'] = re.sub(r'(?i)\b(PWD|PASSWORD)=[^;]*','\\1=********',connect)
+            tabledef_obj_data['source_table_name'] = source_table_name
+
+        return tabledef_obj_data
+
+    def close_database(self):
+        '''Closes the current database but leaves Access running.'''
+        if self._currentdb is not None:
+            self._currentdb.Close()
+            self._currentdb = None
+        self.ac.CloseCurrentDatabase()
 
     def __del__(self):
-        '''Ensure objects are closed when done using them.'''
-        if self.ac is not None:
+        '''Ensure objects are closed when done using them. An Access instance that was handed over (or that was terminated
+        because a call hung) is left alone.'''
+        if self.ac is not None and self._owns_application and not self.com_calls.terminated:
             self.currentdb.Close()
             self.ac.CloseCurrentDatabase()
             self.ac.Quit()
 
-class file_export_automation():
+class file_export_automation(export_location):
     '''Object that can take the python list of module/query data from an ms_access automation and export each document as a file.'''
 
-    def __init__(self):
+    def __init__(self,profiler = None):
+
+        export_location.__init__(self)
 
         # The following variable translates the module type into the file extension:
         # 0 = standard module (*.bas)
@@ -277,8 +2450,60 @@ class file_export_automation():
         # for naming reasons so we defined it as "2".
         self._file_ext_definitions = ['.bas','.cls','.cls']
 
+        # The manifest lives inside the exports directory and records the content hash, source name and kind of every
+        # exported file (keyed by its path relative to the exports directory) so unchanged objects are never rewritten.
+        self._manifest_file_name = 'manifest.json'
+
+        # Every file is normalized before it is hashed and written (see _normalized), and written as UTF-8 with "lf" or
+        # "crlf" newlines. When only verifying, nothing is written: the export reports which files would change and
+        # whether the change is semantic or only cosmetic (the file on disk would be the same once normalized).
+        self.newline = 'lf'
+        self.verify_only = False
+        self._newlines = {'lf' : '\n', 'crlf' : '\r\n'}
+
+        # Nothing is written to the exports directory while the objects are exported. Changed files are staged in the cache
+        # directory and published at the end: the renames and deletions are first written to a journal, so a publish that
+        # is interrupted is finished by the next export and the exports directory never holds a mix of two exports.
+        self._staging_directory_name = 'staging'
+        self._publish_journal_file_name = 'publish_journal.json'
+        self._export_lock_file_name = 'export.lock'
+        self._export_lock = None
+        self._publish_operations = []
+        self._manifest = {}
+        self._previous_manifest = {}
+        self._export_summary = None
+        self.profiler = export_profiler() if profiler is None else profiler
+
+        # Tells whether the export looked at an object (by kind and name). Previously exported files of objects it didn't
+        # look at are kept rather than deleted as stale. None means it looked at every object.
+        self.export_scope = None
+
+        # Records can be saved by several writer threads at once, so the manifest and the summary are shared under a lock.
+        self._manifest_lock = threading.Lock()
+
+        # The profiler phase each kind of object is saved in.
+        self._saving_phases = {'table' : 'save_tables', 'module' : 'save_modules', 'query' : 'save_queries', 'table_data' : 'table_data',
+                               'form' : 'save_texts', 'report' : 'save_texts', 'macro' : 'save_texts'}
+
+        # The rows of tables are written as "csv" or "jsonl" files in the table_data subdirectory.
+        self.table_data_format = 'csv'
+
     def run(self):
         '''Takes all the modules in the python list of an ms_access_automation object and exports them as files.'''
+
+        self.begin_export()
+        try:
+            # Every record is timed in its saving phase by save_record.
+            for module in self._module_data: self.save_record(('module',module))
+            for query in self._query_data: self.save_record(('query',query))
+            for table in self._table_data: self.save_record(('table',table))
+            for text in self._text_data: self.save_record(('text',text))
+            self.finish_export()
+        finally:
+            self.end_export()
+
+    def begin_export(self):
+        '''Creates the exports directory and its subdirectories and loads the manifest of the previous export.'''
         
         def _ensure_directories_exist():
             '''Creates all the necessary export directories and subdirectories if they do not exist.'''
@@ -288,11 +2513,11 @@ class file_export_automation():
 
                 def _export_directory_exists():
                     '''Checks to see if the git_exports directory exists and returns true or false.'''
-                    self._export_directory_path = os.path.join(project_directory_path,'git_exports')
+                    self._export_directory_path = self.export_directory_path
                     return os.path.exists(path = self._export_directory_path)
 
                 # If the directory doesn't exist then create it.
-                if not _export_directory_exists(): os.mkdir(path = self._export_directory_path)
+                if not _export_directory_exists(): os.makedirs(self._export_directory_path)
 
             def _ensure_tables_directory_exists():
                 '''If the tables subdirectory doesn't exist, this method creates it.'''
@@ -331,57 +2556,1085 @@ class file_export_automation():
             _ensure_modules_directory_exists()
             _ensure_queries_directory_exists()
 
-        def _save_all_tables():
-            '''Saves all the queries' SQL in text format in the queries sub directory of the exports directory.'''
+        def _load_manifest():
+            '''Loads the manifest of the previous export (if there is one) so unchanged objects can be skipped.'''
 
-            # For each QueryDef in the Accdb.
-            for table in self._table_data:
+            self._manifest_path = os.path.join(self._export_directory_path,self._manifest_file_name)
+            try:
+                with open(file = self._manifest_path,mode = 'r') as file:
+                    self._previous_manifest = json.load(file)
+            except (OSError,ValueError):
+                self._previous_manifest = {}
 
-                # Build the fully qualified file name.
-                full_name = os.path.join(self._tables_directory_path,table["name"] + '.txt')
-                
-                 # Export the SQL code.
-                with open(file = full_name,mode = 'w') as file:
-                    file.write(json.dumps(table, indent=2))
+            # Start a fresh manifest, a fresh summary and a fresh list of files to publish for this export.
+            self._manifest = {}
+            self._publish_operations = []
+            changed_outcomes = ['semantic','cosmetic'] if self.verify_only else ['changed']
+            self._export_summary = {outcome : [] for outcome in ['added'] + changed_outcomes + ['removed','unchanged']}
 
-        def _save_all_modules():
-            '''Saves all the modules with the correct extension in the modules sub directory of the exports directory.'''
+        _ensure_directories_exist()
+        self.ensure_cache_directory_exists()
 
-            # For each class module, standard module, and [non-empty] form module.
-            for (file_name,module_type,code) in self._module_data:
-                if code is not None:
-                    
-                    # Translate the module type into a file extension.
-                    file_extension = self._file_ext_definitions[module_type]
+        # Exports of the same directory (by the hook, the daemon and the watcher, say) take turns from here until the end
+        # of the export, so none of them throws away what another one staged or publishes it half-written.
+        self._export_lock = file_lock(os.path.join(self.cache_directory_path,self._export_lock_file_name),
+                                      waiting_message = 'Waiting for another export of this directory to finish...')
+        self._export_lock.acquire()
+        self._recover_interrupted_publish()
+        _load_manifest()
 
-                    # Build the fully qualified file name.
-                    full_name = os.path.join(self._modules_directory_path, file_name + file_extension)
+        print('Writing files to: ' + self._export_directory_path)
 
-                    # Export the code.
-                    with open(file = full_name, mode = 'w') as file:
-                        file.write(code)
+    def end_export(self):
+        '''Lets other exports of the exports directory go ahead. Called once the export is finished or has failed.'''
+        if self._export_lock is not None: self._export_lock.release()
+        self._export_lock = None
 
-        def _save_all_queries():
-            '''Saves all the queries' SQL in text format in the queries sub directory of the exports directory.'''
+    def save_record(self,record):
+        '''Saves one (kind,data) record mined by an ms_access_automation. Safe to call from several threads at once.'''
 
-            # For each QueryDef in the Accdb.
-            for (file_name,sql) in self._query_data:
+        kind,data = record
 
-                # Build the fully qualified file name.
-                full_name = os.path.join(self._queries_directory_path,file_name + '.txt')
+        # The writers save records outside of any phase, so their time is added to the saving phase of the record.
+        with self.profiler.work(self._saving_phases[data[0] if kind == 'text' else kind]):
+            if kind == 'table':
+                self._save_table(data)
+            elif kind == 'module':
+                self._save_module(*data)
+            elif kind == 'query':
+                self._save_query(*data)
+            elif kind == 'text':
+                self._save_text(*data)
 
-                # Export the SQL code.
-                with open(file = full_name,mode = 'w') as file:
-                    file.write(sql)
+    def finish_export(self):
+        '''Deletes the files of objects that no longer exist, writes the manifest and prints a summary of the export.'''
 
-        project_directory_path = os.path.abspath(os.path.dirname(self.db_path))
-        _ensure_directories_exist()
-        
-        print('Writing files to: ' + self._export_directory_path)
+        def _remove_stale_files():
+            '''Deletes (when published) the files of objects that were exported previously but no longer exist in the database.'''
+
+            for relative_name,entry in self._previous_manifest.items():
+                if relative_name in self._manifest: continue
+
+                # Files of the kinds this export didn't write at all (saved text and table data are only written when
+                # asked for) are kept, like the files of the objects outside the scope of the export.
+                if entry['kind'] in ('form','report','macro') and not self.save_as_text:
+                    self._manifest[relative_name] = entry
+                elif entry['kind'] == 'table_data' and self.table_data is None:
+                    self._manifest[relative_name] = entry
+                elif self.export_scope is not None and not all(self.export_scope(kind,name) for kind,name in self._objects_of(entry)):
+                    self._manifest[relative_name] = entry
+                else:
+                    self._publish_operations += [('delete',relative_name)]
+                    self._export_summary['removed'] += [relative_name]
+
+        def _save_manifest():
+            '''Stages the manifest of this export (unless it didn't change) so the next one can skip the unchanged objects.'''
+            if self._manifest != self._previous_manifest or not os.path.exists(self._manifest_path):
+                with open(file = self._staged_name(self._manifest_path),mode = 'w',encoding = 'utf-8',newline = '') as file:
+                    file.write(json.dumps(self._manifest, indent=2, sort_keys=True))
+                self._publish_operations += [('replace',self._manifest_file_name)]
+
+        def _display_summary():
+            '''Prints what was added, changed, removed or left unchanged by this export.'''
+
+            # Writers finish in any order, so sort the names to keep the summary stable.
+            for outcome in self._export_summary:
+                if outcome == 'unchanged': continue
+                for relative_name in sorted(self._export_summary[outcome]):
+                    print(outcome.capitalize() + ': ' + relative_name)
+
+            print(', '.join(str(len(self._export_summary[outcome])) + ' ' + outcome for outcome in self._export_summary))
+
+        def _update_index():
+            '''Brings the cross-reference index up to date with the published files, reading only the ones that changed.
+            The index is only a cache: if it can't be updated (e.g. a lookup has it locked) it is deleted, and the next
+            export builds it again, rather than failing an export that was already published.'''
+
+            index_path = os.path.join(self.cache_directory_path,object_index.file_name)
+            index = None
+            try:
+                index = object_index(index_path)
+                index.update(self._export_directory_path,self._manifest)
+                index.close()
+            except sqlite3.Error as error:
+                # Closing without committing drops whatever the update did. Should the file be in use and stay, its hashes
+                # are those of the files it was built from, so the next update still catches up.
+                if index is not None: index.connection.close()
+                print('Could not update the cross-reference index (the next export rebuilds it): ' + str(error))
+                with contextlib.suppress(OSError): os.remove(index_path)
+
+        _remove_stale_files()
+        if not self.verify_only:
+            _save_manifest()
+            with self.profiler.phase('publish'): self._publish()
+            with self.profiler.phase('index'): _update_index()
+        else:
+            print('Verified only: nothing was written.')
+        _display_summary()
+
+    @staticmethod
+    def _objects_of(entry):
+        '''Returns the kind and name of the object a manifest entry could have been exported from (a module named Form_*
+        can be the module of a form or a module that happens to be named that way).'''
+
+        kinds = {'table' : 'tables', 'table_data' : 'tables', 'module' : 'modules', 'query' : 'queries', 'form' : 'forms', 'report' : 'reports', 'macro' : 'macros'}
+        objects = [(kinds[entry['kind']],entry['name'])]
+        if entry['kind'] == 'module' and entry['name'].startswith('Form_'): objects += [('forms',entry['name'][len('Form_'):])]
+        return objects
+
+    def _staged_name(self,full_name):
+        '''Returns the path in the staging directory a file of the exports directory is written to.'''
+
+        relative_name = os.path.relpath(full_name,self._export_directory_path)
+        staged_name = os.path.join(self.cache_directory_path,self._staging_directory_name,relative_name)
+        os.makedirs(os.path.dirname(staged_name),exist_ok = True)
+        return staged_name
+
+    def _publish(self):
+        '''Moves the staged files into the exports directory and deletes the stale ones, journaling the operations first.'''
+
+        if not self._publish_operations: return
+
+        # The staged files are flushed to disk all at once (instead of one at a time as they are written), so the journal
+        # never points at files that could still be lost.
+        for operation,relative_name in self._publish_operations:
+            if operation == 'replace': self._fsync(os.path.join(self.cache_directory_path,self._staging_directory_name,*relative_name.split('/')))
+
+        journal_path = os.path.join(self.cache_directory_path,self._publish_journal_file_name)
+        with open(file = journal_path + '.tmp',mode = 'w') as file:
+            json.dump(self._publish_operations,file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(journal_path + '.tmp',journal_path)
+        self._fsync(self.cache_directory_path)
+
+        self._roll_forward(self._publish_operations)
+
+    def _recover_interrupted_publish(self):
+        '''Finishes the publish of an export that was interrupted, and throws away what an unfinished export staged.'''
+
+        journal_path = os.path.join(self.cache_directory_path,self._publish_journal_file_name)
+        if os.path.exists(journal_path):
+            with open(file = journal_path,mode = 'r') as file:
+                self._roll_forward([tuple(operation) for operation in json.load(file)])
+            print('Finished publishing an interrupted export.')
+
+        shutil.rmtree(os.path.join(self.cache_directory_path,self._staging_directory_name),ignore_errors = True)
+
+    def _roll_forward(self,operations):
+        '''Carries out the journaled operations (any that were already carried out are skipped), then flushes the
+        directories that changed and drops the journal.'''
+
+        staging_directory_path = os.path.join(self.cache_directory_path,self._staging_directory_name)
+        changed_directories = set()
+        for operation,relative_name in operations:
+            full_name = os.path.join(self._export_directory_path,*relative_name.split('/'))
+            staged_name = os.path.join(staging_directory_path,*relative_name.split('/'))
+            if operation == 'replace' and os.path.exists(staged_name):
+                os.makedirs(os.path.dirname(full_name),exist_ok = True)
+                os.replace(staged_name,full_name)
+            elif operation == 'delete' and os.path.exists(full_name):
+                os.remove(full_name)
+            else:
+                continue
+            changed_directories.add(os.path.dirname(full_name))
+
+        for directory_path in changed_directories: self._fsync(directory_path)
+        os.remove(os.path.join(self.cache_directory_path,self._publish_journal_file_name))
+        shutil.rmtree(staging_directory_path,ignore_errors = True)
+
+    @staticmethod
+    def _fsync(path):
+        '''Flushes a file or directory to disk. Directories can't be opened on Windows, where renames are durable anyway.'''
+
+        if os.path.isdir(path):
+            if os.name == 'nt': return
+            descriptor = os.open(path,os.O_RDONLY)
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+        else:
+            # Windows flushes a file (FlushFileBuffers) only through a handle that can write to it.
+            with open(file = path,mode = 'rb+') as file:
+                os.fsync(file.fileno())
+
+    def _save_table(self,table):
+        '''Saves the table's field definitions in JSON format in the tables sub directory of the exports directory.'''
+
+        # Build the fully qualified file name.
+        full_name = os.path.join(self._tables_directory_path,table["name"] + '.txt')
+
+        # Export the field definitions.
+        self._write_if_changed('table',table["name"],full_name,self._normalized('table',table))
+
+    def _save_module(self,file_name,module_type,code):
+        '''Saves a module with the correct extension in the modules sub directory of the exports directory.'''
+
+        # Only class modules, standard modules, and [non-empty] form modules are saved.
+        if code is not None:
+
+            # Translate the module type into a file extension.
+            file_extension = self._file_ext_definitions[module_type]
+
+            # Build the fully qualified file name.
+            full_name = os.path.join(self._modules_directory_path, file_name + file_extension)
+
+            # Export the code.
+            self._write_if_changed('module',file_name,full_name,self._normalized('module',code))
+
+    def _save_query(self,file_name,sql):
+        '''Saves the query's SQL in text format in the queries sub directory of the exports directory.'''
+
+        # Build the fully qualified file name.
+        full_name = os.path.join(self._queries_directory_path,file_name + '.txt')
+
+        # Export the SQL code.
+        self._write_if_changed('query',file_name,full_name,self._normalized('query',sql))
+
+    def save_snapshot(self,pack_path,snapshot_name):
+        '''Adds the files of this export to a pack as a snapshot (see snapshot_pack).'''
+
+        pack = snapshot_pack(pack_path)
+        new_object_count = pack.add_snapshot(snapshot_name,self._export_directory_path,self._manifest,database = os.path.abspath(self.db_path),
+                                             created = datetime.datetime.now().isoformat(timespec = 'seconds'))
+        print('Snapshot "' + snapshot_name + '" added to ' + pack.pack_path + ': ' + str(len(self._manifest)) + ' files, ' +
+              str(new_object_count) + ' of them new to the pack.')
+
+    def save_table_data(self,table_name,columns,rows):
+        '''Saves the rows of a table in the table_data sub directory of the exports directory, writing them as they come so
+        only a chunk of them is ever held in memory. If the rows can't be read the file of the previous export is kept.'''
+
+        def _csv_field(value):
+            '''Returns a value as a CSV field, quoted only when it has to be. NULL is left empty and the empty string is
+            quoted (""), so the two can be told apart.'''
+            if value is None: return ''
+            text = str(value)
+            if text == '' or any(character in text for character in ',"\r\n'): return '"' + text.replace('"','""') + '"'
+            return text
+
+        def _csv_chunks():
+            '''Yields the CSV text of the header and the rows, a few thousand rows at a time.'''
+            buffer = io.StringIO()
+            buffer.write(','.join(_csv_field(column) for column in columns) + self._newlines[self.newline])
+            for row in rows:
+                buffer.write(','.join(_csv_field(self._table_data_value(value)) for value in row) + self._newlines[self.newline])
+                if buffer.tell() > 65536:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+
+        def _jsonl_chunks():
+            '''Yields one JSON object per row.'''
+            for row in rows:
+                yield json.dumps(dict(zip(columns,(self._table_data_value(value) for value in row))),ensure_ascii = False) + self._newlines[self.newline]
+
+        full_name = os.path.join(self._export_directory_path,'table_data',table_name + '.' + self.table_data_format)
+        chunks = _csv_chunks() if self.table_data_format == 'csv' else _jsonl_chunks()
+
+        try:
+            self._write_chunks_if_changed('table_data',table_name,full_name,chunks)
+        except Exception as exception:
+            print('Could not export the rows of "' + table_name + '": ' + repr(exception))
+            relative_name = os.path.relpath(full_name,self._export_directory_path).replace(os.sep,'/')
+            with self._manifest_lock:
+                if relative_name in self._previous_manifest:
+                    self._export_summary['unchanged'] += [relative_name]
+                    self._manifest[relative_name] = self._previous_manifest[relative_name]
+
+    def _write_chunks_if_changed(self,kind,name,full_name,chunks):
+        '''Writes the chunks of text to the staging directory while hashing them, and only keeps them to be published when
+        their hash differs from the one of the previous export.'''
+
+        relative_name = os.path.relpath(full_name,self._export_directory_path).replace(os.sep,'/')
+        staged_name = self._staged_name(full_name)
+        content_hash = hashlib.sha1()
+        try:
+            with self.profiler.step(self._saving_phases[kind],name,'write'):
+                with open(file = staged_name,mode = 'w',encoding = 'utf-8',newline = '') as file:
+                    for chunk in chunks:
+                        content_hash.update(chunk.encode('utf-8'))
+                        file.write(chunk)
+        except BaseException:
+            # A file that can't be removed is thrown away with the staging directory; the original error is what matters.
+            with contextlib.suppress(OSError): os.remove(staged_name)
+            raise
+        content_hash = content_hash.hexdigest()
+        previous_entry = self._previous_manifest.get(relative_name)
+
+        # Files exported before the manifest existed are compared against what is on disk instead.
+        previous_hash = previous_entry['hash'] if previous_entry is not None else self._file_hash(full_name)
+
+        if previous_hash == content_hash and os.path.exists(full_name):
+            os.remove(staged_name)
+            outcome = 'unchanged'
+        elif self.verify_only:
+            # Rows are written the same way on every run, so only their newlines can differ cosmetically.
+            if not os.path.exists(full_name):
+                outcome = 'added'
+            else:
+                with open(file = staged_name,mode = 'rb') as staged_file, open(file = full_name,mode = 'rb') as file:
+                    same_lines = all(line == existing_line for line,existing_line in
+                                     itertools.zip_longest((line.rstrip(b'\r\n') for line in staged_file),(line.rstrip(b'\r\n') for line in file)))
+                outcome = 'cosmetic' if same_lines else 'semantic'
+            os.remove(staged_name)
+        else:
+            outcome = 'changed' if previous_hash is not None else 'added'
+
+        with self._manifest_lock:
+            self._export_summary[outcome] += [relative_name]
+            self._manifest[relative_name] = {'name' : name, 'kind' : kind, 'hash' : content_hash}
+            if outcome != 'unchanged': self._publish_operations += [('replace',relative_name)]
+
+    @staticmethod
+    def _table_data_value(value):
+        '''Converts a value read through DAO into one that CSV and JSON can hold, the same way on every run.'''
+
+        if isinstance(value,datetime.datetime):
+            # pywin32 hands dates over with a time zone attached, but Access stores them without one.
+            return value.replace(tzinfo = None).isoformat(sep = ' ')
+        if isinstance(value,decimal.Decimal):
+            return str(value)
+        if isinstance(value,(bytes,bytearray,memoryview)):
+            return bytes(value).hex()
+        return value
+
+    def _save_text(self,kind,name,text):
+        '''Saves the definition of a form, report or macro in the forms, reports or macros sub directory of the exports directory.'''
+
+        # Build the fully qualified file name. The subdirectories are only made (when publishing) for databases that are
+        # saved as text.
+        full_name = os.path.join(self._export_directory_path,kind + 's',name + '.txt')
+
+        # Export the definition.
+        self._write_if_changed(kind,name,full_name,self._normalized(kind,text))
+
+    def _write_if_changed(self,kind,name,full_name,content):
+        '''Writes the content to the file only when its hash differs from the one of the previous export.'''
+
+        relative_name = os.path.relpath(full_name,self._export_directory_path).replace(os.sep,'/')
+        with self.profiler.step(self._saving_phases[kind],name,'hash'):
+            content_hash = self._content_hash(content)
+        previous_entry = self._previous_manifest.get(relative_name)
+
+        # Files exported before the manifest existed are compared against what is on disk instead.
+        previous_hash = previous_entry['hash'] if previous_entry is not None else self._file_hash(full_name)
+
+        if self.verify_only:
+            outcome = self._verified_outcome(kind,full_name,content)
+        elif previous_hash == content_hash and os.path.exists(full_name):
+            outcome = 'unchanged'
+        else:
+            with self.profiler.step(self._saving_phases[kind],name,'write'):
+                with open(file = self._staged_name(full_name),mode = 'w',encoding = 'utf-8',newline = '') as file:
+                    file.write(content)
+            outcome = 'changed' if previous_hash is not None else 'added'
+
+        with self._manifest_lock:
+            self._export_summary[outcome] += [relative_name]
+            self._manifest[relative_name] = {'name' : name, 'kind' : kind, 'hash' : content_hash}
+            if outcome != 'unchanged': self._publish_operations += [('replace',relative_name)]
+
+    def _normalized(self,kind,content):
+        '''Returns the content of a file the way it is written, so an object that didn't change always gives the same
+        bytes whatever Access returned: keys of table JSON sorted (fields stay in table order, indexes and relations are
+        sorted by name), no trailing whitespace or trailing blank lines, and the newlines of the newline policy. Also
+        drops lines that carry nothing: the VBA attributes of modules that only repeat the name or a default (other
+        attributes, such as VB_PredeclaredId or VB_Exposed, are kept), the Checksum of forms, reports and macros, and the
+        printer settings of forms (reports keep theirs, as they decide how they print).'''
+
+        newline = self._newlines[self.newline]
+
+        if kind == 'table':
+            table = json.loads(content) if isinstance(content,str) else dict(content)
+            for key in ['indexes','relations']:
+                if key in table: table[key] = sorted(table[key],key = lambda entry: entry['name'])
+            return json.dumps(table,indent = 2,sort_keys = True,ensure_ascii = False).replace('\n',newline) + newline
+
+        lines = [line.rstrip(' \t') for line in re.split(r'\r*\n|\r',content or '')]
+
+        if kind == 'module':
+            lines = [line for line in lines if not self._noise_attribute_pattern.match(line)]
+        elif kind in ['form','report','macro']:
+            kept_lines = []
+            printer_block_end = None
+            for line in lines:
+                if printer_block_end is not None:
+                    if line == printer_block_end: printer_block_end = None
+                    continue
+                if kind == 'form' and re.match(r'\s*(PrtMip|PrtDevMode|PrtDevModeW|PrtDevNames|PrtDevNamesW) = Begin$',line):
+                    printer_block_end = line[:len(line) - len(line.lstrip())] + 'End'
+                    continue
+                if not line.startswith('Checksum ='): kept_lines += [line]
+            lines = kept_lines
+
+        while lines and not lines[-1]: lines.pop()
+        return newline.join(lines) + newline if lines else ''
+
+    # The attributes of a module that only repeat its name or a default value.
+    _noise_attribute_pattern = re.compile(r'Attribute VB_(?:Name = .*|GlobalNameSpace = False|Creatable = False)$')
+
+    def _verified_outcome(self,kind,full_name,content):
+        '''Compares what would be written with the file on disk and returns "unchanged", "added", "cosmetic" (the file
+        would be the same once normalized) or "semantic".'''
+
+        if not os.path.exists(full_name): return 'added'
+        try:
+            with open(file = full_name,mode = 'r',encoding = 'utf-8',newline = '') as file:
+                existing_content = file.read()
+            if existing_content == content: return 'unchanged'
+            return 'cosmetic' if self._normalized(kind,existing_content) == content else 'semantic'
+        except (OSError,ValueError):
+            # Unreadable files and (table) files that aren't valid JSON can't be compared.
+            return 'semantic'
+
+    @staticmethod
+    def _content_hash(content):
+        '''Returns the hash that identifies the contents of an exported file.'''
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def _file_hash(cls,full_name):
+        '''Returns the content hash of a file already on disk or None if it can't be read.'''
+        try:
+            with open(file = full_name,mode = 'r',encoding = 'utf-8',newline = '') as file:
+                return cls._content_hash(file.read())
+        except (OSError,UnicodeDecodeError):
+            return None
+
+class streaming_export_pipeline():
+    '''Bounded queue between the miners, which keep the COM thread busy, and a pool of writer threads that save the
+    records as they arrive. Disk I/O overlaps with the COM calls and only a bounded number of records is ever held in
+    memory.'''
+
+    def __init__(self,save_record,writer_count = 4,queue_size = 64):
+        self._save_record = save_record
+        self._queue = queue.Queue(maxsize = queue_size)
+        self._errors = []
+        self._writers = [threading.Thread(target = self._drain,daemon = True) for writer_number in range(writer_count)]
+        for writer in self._writers: writer.start()
+
+    def put(self,record):
+        '''Queues a record for the writers, waiting while the queue is full. Raises the first error of a writer.'''
+        if self._errors: raise self._errors[0]
+        self._queue.put(record)
+
+    def close(self):
+        '''Waits until the writers saved every queued record. Raises the first error of a writer.'''
+        for writer in self._writers: self._queue.put(None)
+        for writer in self._writers: writer.join()
+        if self._errors: raise self._errors[0]
+
+    def _drain(self):
+        '''Saves queued records until the end of the queue is reached. A writer keeps draining after an error so the
+        miners are never blocked on a full queue.'''
+        while True:
+            record = self._queue.get()
+            if record is None: return
+            try:
+                self._save_record(record)
+            except Exception as error:
+                self._errors.append(error)
+
+class batch_automation():
+    '''Exports many databases in parallel. Every database is exported by its own worker process (and therefore its own
+    Access instance) into its own exports directory, so a crash or a hang only costs that database. A worker that runs
+    out of time is terminated with every process it started and with its Access instance, which COM starts outside of
+    the worker's process tree.'''
+
+    def __init__(self,backend = None,worker_count = 4,timeout = 3600):
+        self.backend = com_access_backend() if backend is None else backend
+        self.worker_count = worker_count
+        self.timeout = timeout
+
+    def database_paths(self,patterns):
+        '''Expands the paths and glob patterns into the sorted list of distinct databases they match.'''
+
+        db_paths = set()
+        for pattern in patterns:
+            matches = glob.glob(pattern,recursive = True) if glob.has_magic(pattern) else [pattern]
+            db_paths.update(os.path.abspath(match) for match in matches if self.backend.accepts(match))
+        return sorted(db_paths)
+
+    def export_directory_paths(self,db_paths):
+        '''Assigns every database its own exports directory: git_exports next to it, or git_exports/<database name> when
+        several databases share a directory.'''
+
+        databases_per_directory = {}
+        for db_path in db_paths:
+            databases_per_directory[os.path.dirname(db_path)] = databases_per_directory.get(os.path.dirname(db_path),0) + 1
+
+        export_directory_paths = {}
+        for db_path in db_paths:
+            export_directory_path = os.path.join(os.path.dirname(db_path),'git_exports')
+            if databases_per_directory[os.path.dirname(db_path)] > 1:
+                export_directory_path = os.path.join(export_directory_path,os.path.splitext(os.path.basename(db_path))[0])
+            export_directory_paths[db_path] = export_directory_path
+        return export_directory_paths
+
+    def run(self,patterns,worker_arguments = ()):
+        '''Exports every database matched by the patterns, passing the worker arguments to each worker. Prints a summary
+        and returns true if every export succeeded.'''
+
+        def _worker_command(db_path):
+            '''Builds the command line that exports one database in a new process.'''
+
+            # A frozen (e.g. PyInstaller) exporter is its own interpreter.
+            command = [sys.executable] if getattr(sys,'frozen',False) else [sys.executable,os.path.abspath(__file__)]
+            return command + [db_path] + list(worker_arguments) + ['--output-dir',export_directory_paths[db_path]]
+
+        def _terminate(worker,process_id_path):
+            '''Terminates a worker, the processes it started and the Access instance it reported.'''
+
+            if os.name == 'nt':
+                subprocess.run(['taskkill','/F','/T','/PID',str(worker.pid)],stdout = subprocess.DEVNULL,stderr = subprocess.DEVNULL)
+            else:
+                with contextlib.suppress(OSError): os.killpg(worker.pid,signal.SIGKILL)
+            try:
+                with open(file = process_id_path,mode = 'r') as file:
+                    os.kill(int(file.read()),signal.SIGTERM)
+            except (OSError,ValueError):
+                pass
+
+        def _export(db_path):
+            '''Runs the worker of one database and returns its outcome, elapsed time and output.'''
+
+            # The worker writes the process id of its Access instance to this file.
+            process_id_path = os.path.join(export_directory_paths[db_path],'.cache','access.pid')
+            started = time.perf_counter()
+            try:
+                os.makedirs(os.path.dirname(process_id_path),exist_ok = True)
+                if os.path.exists(process_id_path): os.remove(process_id_path)
+
+                # The worker gets a process group (or session) of its own so it can be terminated with everything it started.
+                worker = subprocess.Popen(
+                    _worker_command(db_path),
+                    stdout = subprocess.PIPE,
+                    stderr = subprocess.STDOUT,
+                    universal_newlines = True,
+                    env = dict(os.environ,ACCESS_DB_EXPORTER_PID_FILE = process_id_path),
+                    creationflags = subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0,
+                    start_new_session = os.name != 'nt'
+                )
+            except Exception as exception:
+                return db_path,'could not start worker (' + str(exception) + ')',time.perf_counter() - started,''
+
+            try:
+                output = worker.communicate(timeout = self.timeout)[0]
+                outcome = 'succeeded' if worker.returncode == 0 else 'failed (exit status ' + str(worker.returncode) + ')'
+            except subprocess.TimeoutExpired:
+                _terminate(worker,process_id_path)
+                output = worker.communicate()[0] or ''
+                outcome = 'timed out after ' + str(self.timeout) + ' seconds'
+            finally:
+                with contextlib.suppress(OSError): os.remove(process_id_path)
+
+            return db_path,outcome,time.perf_counter() - started,output
+
+        def _save_log(db_path,output):
+            '''Keeps the output of the worker in the cache directory of its exports directory.'''
+
+            log_directory_path = os.path.join(export_directory_paths[db_path],'.cache')
+            try:
+                os.makedirs(log_directory_path,exist_ok = True)
+                with open(file = os.path.join(log_directory_path,'export.log'),mode = 'w') as file:
+                    file.write(output if isinstance(output,str) else output.decode(errors = 'replace'))
+            except OSError:
+                pass
+
+        db_paths = self.database_paths(patterns)
+        if len(db_paths) == 0:
+            print('No databases matched! Export aborted.')
+            return False
+        export_directory_paths = self.export_directory_paths(db_paths)
 
-        _save_all_modules()
-        _save_all_queries()
-        _save_all_tables()
+        print('Exporting ' + str(len(db_paths)) + ' databases with ' + str(self.worker_count) + ' workers...')
+        started = time.perf_counter()
+        outcomes = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers = self.worker_count) as executor:
+            for db_path,outcome,seconds,output in executor.map(_export,db_paths):
+                _save_log(db_path,output)
+                print(db_path + ': ' + outcome + ' in ' + str(round(seconds,1)) + ' seconds')
+                outcomes += [outcome]
+
+        succeeded = outcomes.count('succeeded')
+        print(str(succeeded) + ' of ' + str(len(outcomes)) + ' databases exported in ' + str(round(time.perf_counter() - started,1)) + ' seconds')
+        return succeeded == len(outcomes)
+
+class export_daemon():
+    '''Resident exporter that keeps one Access instance warm and serves export requests over a local socket, switching
+    databases with OpenCurrentDatabase/CloseCurrentDatabase. The instance is recycled after a number of jobs or after
+    an error. Requests and replies are JSON, never pickles, so even a client holding the key can only ask for exports.'''
+
+    # Requests are small: the options of one export.
+    request_size_limit = 1024 * 1024
+
+    # The fields a request can have and the JSON types of their values (None meaning the field can be null).
+    request_fields = {
+        'db_path' : (str,), 'pretty_print_sql' : (bool,), 'full_export' : (bool,), 'profile_path' : (str,type(None)),
+        'read_code_from_vbe' : (bool,), 'export_directory_path' : (str,type(None)), 'writer_count' : (int,),
+        'table_data' : (dict,type(None)), 'save_as_text' : (bool,), 'newline' : (str,), 'verify_only' : (bool,),
+        'objects' : (dict,type(None)), 'changed_only' : (bool,), 'com_timeout' : (int,float), 'pack_path' : (str,type(None)),
+        'snapshot_name' : (str,type(None)), 'stop' : (bool,)
+    }
+
+    def __init__(self,backend = None,address = ('localhost',47511),authkey = None,max_jobs = 50):
+        self.backend = com_access_backend() if backend is None else backend
+        self.address = address
+        self.authkey = _daemon_authkey() if authkey is None else authkey
+        self.max_jobs = max_jobs
+        self._application = None
+        self._job_count = 0
+
+    def serve(self):
+        '''Serves export requests, one at a time, until a stop request arrives.'''
+
+        print('Export daemon listening on ' + self.address[0] + ':' + str(self.address[1]) + '...')
+        with multiprocessing.connection.Listener(self.address,authkey = self.authkey) as listener:
+            stopping = False
+            while not stopping:
+                try:
+                    with listener.accept() as connection:
+                        request = json.loads(connection.recv_bytes(self.request_size_limit).decode('utf-8'))
+                        if not isinstance(request,dict): raise ValueError('A request has to be a JSON object.')
+                        stopping = request.get('stop',False) is True
+                        reply = {'exported' : True, 'output' : 'Export daemon stopped.\n'} if stopping else self._export(request)
+                        connection.send_bytes(json.dumps(reply).encode('utf-8'))
+                except (OSError,EOFError,ValueError,multiprocessing.AuthenticationError) as error:
+                    print('Dropped a request: ' + str(error))
+
+        self._recycle_application()
+
+    def _export(self,request):
+        '''Exports the database of a request with the warm Access instance and returns the reply for the client.'''
+
+        error = self._request_error(request)
+        if error is not None:
+            print('Refused a request: ' + error)
+            return {'exported' : False, 'output' : 'The export daemon refused the request: ' + error + '\n'}
+
+        db_path = request['db_path']
+        if not self.backend.accepts(db_path):
+            return {'exported' : False, 'output' : 'Inputted file path of "' + db_path + '" is invalid! Export aborted.\n'}
+
+        if self._application is None:
+            self._application = self.backend.create_application()
+            self._job_count = 0
+
+        started = time.perf_counter()
+        output = io.StringIO()
+        exporter = automation(self.backend,self._application)
+        try:
+            # The fields of a request are named after the options of automation.run; the ones left out keep their defaults.
+            export_options = {field : value for field,value in request.items() if field not in ('db_path','stop')}
+            if 'table_data' in export_options: export_options['table_data'] = table_data_selection(**export_options['table_data']) if export_options['table_data'] else None
+            if 'objects' in export_options: export_options['objects'] = object_filter(**export_options['objects']) if export_options['objects'] else None
+            with contextlib.redirect_stdout(output):
+                exported = exporter.run(db_path,**export_options)
+            exporter.close_database()
+        except Exception as exception:
+            output.write('Export failed: ' + repr(exception) + '\n')
+            exported = False
+            self._recycle_application()
+
+        self._job_count += 1
+        if self._job_count >= self.max_jobs: self._recycle_application()
+
+        print(db_path + ': ' + ('exported' if exported else 'failed') + ' in ' + str(round(time.perf_counter() - started,1)) + ' seconds')
+        return {'exported' : exported, 'output' : output.getvalue()}
+
+    def _request_error(self,request):
+        '''Returns what is wrong with the fields of an export request, or None if nothing is.'''
+
+        if 'db_path' not in request: return 'it has no db_path.'
+        for field,value in request.items():
+            if field not in self.request_fields: return 'it has an unknown field "' + field + '".'
+            # True is an int in Python, so a boolean has to be asked for to be accepted.
+            if not isinstance(value,self.request_fields[field]) or (isinstance(value,bool) and bool not in self.request_fields[field]):
+                return 'the value of "' + field + '" has the wrong type.'
+        return None
+
+    def _recycle_application(self):
+        '''Quits the Access instance so the next request starts a fresh one.'''
+
+        if self._application is not None:
+            try:
+                self._application.CloseCurrentDatabase()
+            except Exception:
+                pass
+            try:
+                self._application.Quit()
+            except Exception:
+                pass
+        self._application = None
+
+class export_client():
+    '''Thin client that hands an export over to a running export daemon.'''
+
+    def __init__(self,address = ('localhost',47511),authkey = None):
+        self.address = address
+        self.authkey = _daemon_authkey() if authkey is None else authkey
+
+    def request(self,**request):
+        '''Sends a request to the daemon and returns its reply, or None if no daemon (with the same key) is listening.'''
+
+        try:
+            with multiprocessing.connection.Client(self.address,authkey = self.authkey) as connection:
+                connection.send_bytes(json.dumps(request).encode('utf-8'))
+                return json.loads(connection.recv_bytes().decode('utf-8'))
+        except (ConnectionRefusedError,FileNotFoundError):
+            return None
+        except multiprocessing.AuthenticationError:
+            print('The export daemon on port ' + str(self.address[1]) + ' was started with another key. Exporting in-process instead.')
+            return None
+
+class export_watcher():
+    '''Attaches to an Access instance someone is working in and, whenever something is saved, exports the objects that
+    changed. Every poll only looks at markers whose cost doesn't grow with the project: the size and modification time
+    of the database file and whether the VBA project has unsaved changes.'''
+
+    def __init__(self,backend = None,db_path = None,interval = 2.0):
+        self.backend = com_access_backend() if backend is None else backend
+        self.db_path = db_path
+        self.interval = interval
+
+    def watch(self,**export_options):
+        '''Exports the changed objects with the given options (those of automation.run) every time the markers change,
+        until Access is closed or the watch is interrupted. Returns false if no instance could be attached to.'''
+
+        try:
+            application = self.backend.attach_application(self.db_path)
+            db_path = self.db_path or application.CurrentProject.FullName
+        except Exception as exception:
+            print('Could not attach to MS Access: ' + str(exception))
+            return False
+
+        def _marker():
+            '''Returns the size and modification time of the database file and whether the VBA project is saved.'''
+
+            stat = os.stat(db_path)
+            try:
+                saved = application.VBE.ActiveVBProject.Saved
+            except AttributeError:
+                saved = True
+            return (stat.st_mtime_ns,stat.st_size,bool(saved))
+
+        def _export():
+            '''Exports the objects changed since the last export (reading code from the VBA project, so nothing the
+            developer has open gets opened or closed) and prints what changed.'''
+
+            exporter = automation(self.backend,application)
+            exporter.database_already_open = True
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                exporter.run(db_path,**dict(export_options,read_code_from_vbe = True,changed_only = True))
+            for line in output.getvalue().splitlines():
+                if line.startswith(('Added: ','Changed: ','Removed: ')): print(time.strftime('%H:%M:%S') + ' ' + line)
+
+        print('Watching "' + db_path + '" every ' + str(self.interval) + ' seconds. Press Ctrl+C to stop.')
+        exported_marker = None
+        try:
+            while True:
+                try:
+                    marker = _marker()
+                except OSError:
+                    print('The database is gone. Stopped watching.')
+                    return True
+                except Exception:
+                    print('MS Access was closed. Stopped watching.')
+                    return True
+
+                # Code that is being edited is only exported once it is saved.
+                if marker != exported_marker and marker[2]:
+                    try:
+                        _export()
+                        exported_marker = marker
+                    except Exception as exception:
+                        # Access is busy (e.g. showing a dialog), so try again at the next poll.
+                        print(time.strftime('%H:%M:%S') + ' Export failed, retrying: ' + repr(exception))
+
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            print('Stopped watching.')
+            return True
+
+class database_importer():
+    '''Rebuilds a database from an exports directory: creates (or replaces) the modules through the VBA project, the
+    queries with CreateQueryDef and the tables and relations with CreateTableDef/CreateRelation. Only the objects that
+    differ from the target are touched, and the DAO changes are made in a single transaction.'''
+
+    def __init__(self,backend = None,com_timeout = 300):
+        self.backend = com_access_backend() if backend is None else backend
+        self.com_calls = com_call_layer(timeout = com_timeout)
+        self.ac = None
+
+        # Compares the files with the objects of the target the way the exporter would write them (pretty printed or not).
+        self._normalizer = file_export_automation()
+        self._sql_formatter = sql_formatter()
+
+    def run(self,db_path,export_directory_path):
+        '''Imports the exports directory into the database (which is created if it doesn't exist) and returns true if the
+        import succeeded.'''
+
+        def _read_exports():
+            '''Reads the modules (but not the form modules, which belong to their forms), queries and tables of the exports
+            directory, keyed by name.'''
+
+            def _files(subdirectory,extensions):
+                '''Yields the name, extension and contents of the files of a subdirectory.'''
+                subdirectory_path = os.path.join(export_directory_path,subdirectory)
+                for file_name in sorted(os.listdir(subdirectory_path)) if os.path.isdir(subdirectory_path) else []:
+                    name,extension = os.path.splitext(file_name)
+                    if extension not in extensions: continue
+                    with open(file = os.path.join(subdirectory_path,file_name),mode = 'r',encoding = 'utf-8') as file:
+                        yield name,extension,file.read()
+
+            exports = {'modules' : {}, 'queries' : {}, 'tables' : {}, 'relations' : {}}
+            for name,extension,code in _files('modules',['.bas','.cls']):
+                if extension == '.cls' and name.startswith('Form_'):
+                    self._skipped += ['modules/' + name + extension + ' (form modules are imported with their forms)']
+                else:
+                    # 1 = vbext_ct_StdModule and 2 = vbext_ct_ClassModule.
+                    exports['modules'][name] = (1 if extension == '.bas' else 2,code)
+            for name,extension,sql in _files('queries',['.txt']):
+                exports['queries'][name] = sql
+            for name,extension,table_json in _files('tables',['.txt']):
+                table = json.loads(table_json)
+
+                # Every relation is in the files of both of its tables.
+                for relation in table.pop('relations',[]):
+                    exports['relations'][relation['name']] = relation
+                exports['tables'][name] = table
+            return exports
+
+        def _open_database():
+            '''Starts Access and opens the database, creating it first if it doesn't exist.'''
+
+            self.ac = self.backend.create_application()
+            self.ac = self.com_calls.wrap(self.ac,self.backend.application_process_id(self.ac))
+            if os.path.exists(db_path):
+                self.ac.OpenCurrentDatabase(db_path)
+            else:
+                print('Creating "' + db_path + '"...')
+                self.ac.NewCurrentDatabase(db_path)
+            self.ac.UserControl = False
+
+        def _differs(kind,content,existing_content):
+            '''Returns true if the object would be exported differently from the file. Otherwise false.'''
+            return self._normalizer._normalized(kind,content) != self._normalizer._normalized(kind,existing_content)
+
+        def _query_differs(sql,existing_sql):
+            '''Returns true if the query would be exported differently from the file, whether or not the file was pretty
+            printed. Otherwise false.'''
+            return _differs('query',sql,existing_sql) and _differs('query',sql,self._sql_formatter.format(existing_sql))
+
+        def _table_differs(table,table_def):
+            '''Returns true if the table would be exported differently from its file. Otherwise false.'''
+
+            # The fields of a linked table come from its source, so only the link itself is compared.
+            connect = table_def.Connect
+            existing_table = ms_access_automation.table_schema(table_def.Name,table_def,(connect,table_def.SourceTableName) if connect else None)
+            if 'connect' in table: return (table['connect'],table['source_table_name']) != (existing_table.get('connect'),existing_table.get('source_table_name'))
+            return _differs('table',table,existing_table)
+
+        def _relation_of(relation):
+            '''Returns a Relation the way the exporter writes it.'''
+            return {'name' : relation.Name, 'table' : relation.Table, 'foreign_table' : relation.ForeignTable, 'attributes' : relation.Attributes,
+                    'fields' : [{'name' : field.Name, 'foreign_name' : field.ForeignName} for field in relation.Fields]}
+
+        def _import_tables(database,tables,relations):
+            '''Creates the tables and relations that are missing and replaces the ones that differ (unless a table holds
+            rows, which would be lost).'''
+
+            existing_tables = {table_def.Name : table_def for table_def in database.TableDefs if not table_def.Name.startswith('MSys')}
+            existing_relations = {relation.Name : _relation_of(relation) for relation in database.Relations}
+
+            changed_tables = []
+            for name,table in tables.items():
+                if name in existing_tables and not _table_differs(table,existing_tables[name]):
+                    self._unchanged += 1
+                elif 'connect' in table and '********' in table['connect']:
+                    self._skipped += ['tables/' + name + '.txt (the password of the link is not exported)']
+                elif name in existing_tables and not existing_tables[name].Connect and _has_rows(database,name):
+                    self._skipped += ['tables/' + name + '.txt (the table has rows)']
+                else:
+                    changed_tables += [name]
+
+            # Relations are dropped before their tables are, and are created once both of their tables exist.
+            changed_relations = [name for name,relation in relations.items() if existing_relations.get(name) is None or
+                                 _differs('table',{'relations' : [relation]},{'relations' : [existing_relations[name]]}) or
+                                 relation['table'] in changed_tables or relation['foreign_table'] in changed_tables]
+            self._unchanged += len(relations) - len(changed_relations)
+            for name,relation in existing_relations.items():
+                if name in changed_relations or relation['table'] in changed_tables or relation['foreign_table'] in changed_tables:
+                    database.Relations.Delete(name)
+
+            for name in changed_tables:
+                if name in existing_tables: database.TableDefs.Delete(name)
+                database.TableDefs.Append(_table_def(database,tables[name]))
+                self._imported += ['tables/' + name + '.txt']
+
+            for name in changed_relations:
+                relation = relations[name]
+                if relation['table'] not in tables and relation['table'] not in existing_tables: continue
+                new_relation = database.CreateRelation(name,relation['table'],relation['foreign_table'],relation['attributes'])
+                for field in relation['fields']:
+                    new_field = new_relation.CreateField(field['name'])
+                    new_field.ForeignName = field['foreign_name']
+                    new_relation.Fields.Append(new_field)
+                database.Relations.Append(new_relation)
+                self._imported += ['relation ' + name]
+
+        def _has_rows(database,table_name):
+            '''Returns true if the table holds any row. Otherwise false.'''
+
+            # 4 = dbOpenSnapshot and 8 = dbForwardOnly.
+            recordset = database.OpenRecordset('SELECT TOP 1 * FROM [' + table_name + ']',4,8)
+            try:
+                return not recordset.EOF
+            finally:
+                recordset.Close()
+
+        def _table_def(database,table):
+            '''Builds the TableDef of a table file, ready to be appended.'''
+
+            table_def = database.CreateTableDef(table['name'])
+            if 'connect' in table:
+                table_def.Connect = table['connect']
+                table_def.SourceTableName = table['source_table_name']
+                return table_def
+
+            for field in table['fields']:
+                new_field = table_def.CreateField(field['name'],field['type'],field['size'])
+                new_field.Required = field['required']
+
+                # AllowZeroLength only applies to text (10) and memo (12) fields.
+                if field['type'] in [10,12]: new_field.AllowZeroLength = field['allow_zero_length']
+                table_def.Fields.Append(new_field)
+
+            for index in table['indexes']:
+                new_index = table_def.CreateIndex(index['name'])
+                new_index.Primary = index['primary']
+                new_index.Unique = index['unique']
+                for field in index['fields']:
+                    index_field = new_index.CreateField(field['name'])
+
+                    # 1 = dbDescending.
+                    if field['descending']: index_field.Attributes = 1
+                    new_index.Fields.Append(index_field)
+                table_def.Indexes.Append(new_index)
+            return table_def
+
+        def _import_queries(database,queries):
+            '''Creates the queries that are missing and changes the SQL of the ones that differ.'''
+
+            existing_queries = {query_def.Name : query_def for query_def in database.QueryDefs}
+            for name,sql in queries.items():
+                if name in existing_queries:
+                    if not _query_differs(sql,existing_queries[name].SQL):
+                        self._unchanged += 1
+                        continue
+                    existing_queries[name].SQL = sql
+                else:
+                    database.CreateQueryDef(name,sql)
+                self._imported += ['queries/' + name + '.txt']
+
+        def _import_module_file(vb_components,name,component_type,attribute_lines,code):
+            '''Imports a module with attributes through a module file, the only way the VBA project sets them.'''
+
+            # A class module file starts with the header the VBA editor writes for a class of a VBA project.
+            header = ['VERSION 1.0 CLASS','BEGIN','  MultiUse = -1  \'True','END'] if component_type == 2 else []
+            with tempfile.TemporaryDirectory() as directory_path:
+                file_name = os.path.join(directory_path,name + ('.bas' if component_type == 1 else '.cls'))
+                with open(file = file_name,mode = 'w',encoding = 'utf-8',newline = '') as file:
+                    file.write('\r\n'.join(header + ['Attribute VB_Name = "' + name + '"'] + attribute_lines) + '\r\n' + code)
+                vb_components.Import(file_name)
+
+        def _import_modules(modules):
+            '''Adds the modules that are missing and replaces the code of the ones that differ, then saves them all at once.'''
+
+            vb_components = self.ac.VBE.ActiveVBProject.VBComponents
+            existing_components = {component.Name : component for component in vb_components}
+            for name,(component_type,code) in modules.items():
+
+                # Attribute lines aren't code (and Lines never returns them), so they are compared and added apart from it.
+                # A change to the attributes alone is therefore not imported.
+                lines = re.split(r'\r\n|\n|\r',code)
+                attribute_lines = [line for line in lines if line.startswith('Attribute ') and not line.startswith('Attribute VB_Name ')]
+                code = '\r\n'.join(line for line in lines if not line.startswith('Attribute '))
+
+                component = existing_components.get(name)
+                if component is not None:
+                    code_module = component.CodeModule
+                    if component.Type == component_type and not _differs('module',code,code_module.Lines(1,code_module.CountOfLines) if code_module.CountOfLines else ''):
+                        self._unchanged += 1
+                        continue
+                    if component.Type != component_type or attribute_lines:
+                        vb_components.Remove(component)
+                        component = None
+                if attribute_lines:
+                    _import_module_file(vb_components,name,component_type,attribute_lines,code)
+                    self._imported += ['modules/' + name + ('.bas' if component_type == 1 else '.cls')]
+                    continue
+                if component is None:
+                    component = vb_components.Add(component_type)
+                    component.Name = name
+
+                # A new module already holds the lines Access starts every module with.
+                code_module = component.CodeModule
+                if code_module.CountOfLines: code_module.DeleteLines(1,code_module.CountOfLines)
+                code_module.AddFromString(code)
+                self._imported += ['modules/' + name + ('.bas' if component_type == 1 else '.cls')]
+
+            # 280 = acCmdSaveAllModules.
+            if any(imported.startswith('modules/') for imported in self._imported): self.ac.DoCmd.RunCommand(280)
+
+        if not os.path.isdir(export_directory_path):
+            print('Exports directory "' + export_directory_path + '" does not exist! Import aborted.')
+            return False
+
+        started = time.perf_counter()
+        self._imported = []
+        self._skipped = []
+        self._unchanged = 0
+        exports = _read_exports()
+        try:
+            _open_database()
+            database = self.ac.CurrentDb()
+
+            # Schema changes are made in one DAO transaction so a failed import leaves the tables and queries as they were.
+            workspace = self.ac.DBEngine.Workspaces(0)
+            workspace.BeginTrans()
+            try:
+                _import_tables(database,exports['tables'],exports['relations'])
+                _import_queries(database,exports['queries'])
+                workspace.CommitTrans()
+            except BaseException:
+                workspace.Rollback()
+                raise
+            _import_modules(exports['modules'])
+            database.Close()
+            self.ac.CloseCurrentDatabase()
+        except Exception as exception:
+            print('Import failed: ' + repr(exception))
+            return False
+        finally:
+            self.com_calls.stop()
+            if self.ac is not None and not self.com_calls.terminated:
+                try:
+                    self.ac.Quit()
+                except Exception:
+                    pass
+            self.ac = None
+
+        seconds = time.perf_counter() - started
+        object_count = len(self._imported) + self._unchanged
+        for imported in self._imported: print('Imported: ' + imported)
+        for skipped in self._skipped: print('Skipped: ' + skipped)
+        print(str(len(self._imported)) + ' imported, ' + str(self._unchanged) + ' unchanged, ' + str(len(self._skipped)) + ' skipped in ' +
+              str(round(seconds,1)) + ' seconds (' + str(round(object_count / seconds,1) if seconds else object_count) + ' objects/sec)')
+        return True
 
 class gui():
     '''Validating inputs and (if necessary) opening a file dialog to request a valid MS Access file.'''
@@ -389,13 +3642,8 @@ class gui():
     def _file_is_valid(self):
         '''Checks to see if the file exists and is of the right extension. Returns true for "valid" and false otherwise'''
 
-        # If the file exists and is of appropriate extension then return true otherwise false.
-        if os.path.exists(self.db_path):
-            response = (os.path.splitext(self.db_path)[1] in ['.accdb'])
-        else:
-            response = False
-
-        return response 
+        # If the file exists and is of appropriate extension (for the backend in use) then return true otherwise false.
+        return self.backend.accepts(self.db_path)
 
     def ask_for_db_path(self):
         '''Asks the user for a path to the MS Access file, checks if it's valid, then--if it isn't--prompts the user for retry.'''
@@ -462,15 +3710,41 @@ class gui():
 class automation(ms_access_automation, file_export_automation, gui):
     '''Object that performs all the automations necessary to export the modules in an access database.'''
 
-    def __init__(self):
-        '''Run all the base object initiators in the appropriate order.'''
-        ms_access_automation.__init__(self)
-        file_export_automation.__init__(self)
+    def __init__(self,backend = None,application = None):
+        '''Run all the base object initiators in the appropriate order. The miners and the writers time their work in the
+        same profiler.'''
+        profiler = export_profiler()
+        ms_access_automation.__init__(self,backend,application,profiler)
+        file_export_automation.__init__(self,profiler)
         gui.__init__(self)
                 
-    def run(self, db_path = '', pretty_print_sql = False):
-        '''Runs the automation on a given path.'''
+    def run(self, db_path = '', *, pretty_print_sql = False, full_export = False, profile_path = None, read_code_from_vbe = False,
+            export_directory_path = None, writer_count = 4, table_data = None, save_as_text = False, newline = 'lf',
+            verify_only = False, objects = None, changed_only = False, com_timeout = 300, pack_path = None, snapshot_name = None):
+        '''Runs the automation on a given path and returns true if the export ran. The options are passed by keyword. A
+        full export re-mines every object even if it hasn't changed. When a profile path is given (an empty one meaning the default location) a JSON report
+        of the timings is written to it. Reading the code from the VBE avoids opening every module and form. The files
+        are written to git_exports next to the database unless another exports directory is given, by a pool of writer
+        threads of the given size. The rows of the tables picked by a table data selection are exported as well, and so are
+        the definitions of forms, reports and macros when they are saved as text. Files are written with "lf" or "crlf"
+        newlines. When only verifying, nothing is written and the changes are reported as semantic or cosmetic. An object
+        filter limits the export to some kinds and names of objects, and so does only exporting the changed objects; the
+        files of the other objects are left as they are. A COM call that takes longer than the COM timeout (in seconds, 0
+        meaning no timeout) ends the export. When a pack is given, the exported files are also added to it as a snapshot
+        (named after the database and the time unless a name is given).'''
         self.pretty_print_sql = pretty_print_sql
+        self.full_export = full_export
+        self.read_code_from_vbe = read_code_from_vbe
+        self.requested_export_directory_path = export_directory_path
+        self.table_data = table_data
+        self.save_as_text = save_as_text
+        self.newline = newline
+        self.verify_only = verify_only
+        self.object_filter = object_filter() if objects is None else objects
+        self.changed_only = changed_only
+        self.com_calls.timeout = com_timeout
+        self.export_scope = self.in_scope
+        if table_data is not None: self.table_data_format = table_data.file_format
         def _perform_first_check():
             '''Performs a first round of checks to see if the path is valid and otherwise requests a path using the file dialog.'''
             
@@ -479,11 +3753,52 @@ class automation(ms_access_automation, file_export_automation, gui):
                 if db_path != '': print('Inputted file path of "' + db_path + '" is invalid! Please choose a valid .accdb or cancel.')
                 self.ask_for_db_path()
 
+        def _pack_snapshot_name():
+            '''Returns the name of the snapshot to add to the pack, or None if the name that was given is taken. A name made
+            up from the database and the time gets a number if it is taken.'''
+
+            snapshot_names = set(snapshot_pack(pack_path).snapshot_names())
+            if snapshot_name is not None: return None if snapshot_name in snapshot_names else snapshot_name
+            made_up_name = re.sub(r'\.{2,}','.',os.path.splitext(os.path.basename(self.db_path))[0]) + time.strftime('-%Y%m%d-%H%M%S')
+            name,number = made_up_name,1
+            while name in snapshot_names:
+                number += 1
+                name = made_up_name + '-' + str(number)
+            return name
+
         def _run():
             '''Uses the inputted parameters to run the automation'''
 
-            ms_access_automation.run(self)
-            file_export_automation.run(self)
+            self.profiler.enabled = profile_path is not None
+            self.profiler.reset()
+
+            # The miners stream their records to the writers, which save them while the COM thread keeps mining.
+            file_export_automation.begin_export(self)
+            try:
+                pipeline = streaming_export_pipeline(self.save_record, writer_count)
+                self.record_sink = pipeline.put
+
+                # Rows are read on this (the COM) thread and written while they are read, so they never go through the writers.
+                self.table_data_sink = self.save_table_data
+                try:
+                    ms_access_automation.run(self)
+                finally:
+                    self.record_sink = None
+                    self.table_data_sink = None
+                    with self.profiler.phase('drain_writers'): pipeline.close()
+                file_export_automation.finish_export(self)
+
+                # Only what was published counts as exported for the next export of the changed objects.
+                if not self.verify_only: self.record_published_dates()
+            finally:
+                file_export_automation.end_export(self)
+            if pack_path is not None and not self.verify_only:
+                with self.profiler.phase('pack'): self.save_snapshot(pack_path,pack_snapshot_name)
+
+            if self.profiler.enabled:
+                report_path = profile_path or os.path.join(self.cache_directory_path,'profile.json')
+                self.profiler.save(report_path,database = os.path.abspath(self.db_path),backend = type(self.backend).__name__,com_calls = self.com_calls.report())
+                print('Profile written to: ' + report_path)
 
         self.db_path = db_path
 
@@ -494,19 +3809,293 @@ class automation(ms_access_automation, file_export_automation, gui):
         # a valid file) then respond with a console prompt and exit out of the routine.
         if not self._file_is_valid():
             print('File was invalid! Export aborted.')
+            return False
+        if snapshot_name is not None and not snapshot_pack.is_valid_name(snapshot_name):
+            print('"' + snapshot_name + '" is not a valid snapshot name (it can\'t contain /, \\ or ..)! Export aborted.')
+            return False
+        pack_snapshot_name = _pack_snapshot_name() if pack_path is not None else None
+        if pack_path is not None and pack_snapshot_name is None:
+            print('The pack already has a snapshot named "' + snapshot_name + '"! Export aborted.')
+            return False
         else:
             _run()
+            return True
 
     def __del__(self):
         '''Performs all the neccesary cleanup processes and closes the files.'''
         ms_access_automation.__del__(self)
         gui.__del__(self)
 
-a = automation()
- 
-# Get the MS Access file's fully qualified path from command line argument (if it was provided). Otherwise pass in an
-# empty string.
-file_path = sys.argv[1] if len(sys.argv) > 1 else ''
-pretty_print_sql = sys.argv[2] == 'True' if len(sys.argv) > 2 else False
-a.run(file_path, pretty_print_sql)
+def _row_limit_argument(text):
+    '''Parses a row limit given as ROWS or PATTERN=ROWS into a (pattern,rows) pair.'''
+    pattern,_,rows = text.rpartition('=')
+    try:
+        return (pattern or '*',int(rows))
+    except ValueError:
+        raise argparse.ArgumentTypeError('"' + text + '" is not a row limit like 1000 or Orders*=1000')
+
+def _table_data_selection(arguments):
+    '''Returns the table data selection asked for on the command line or None if the rows are not to be exported.'''
+    if not arguments.table_data: return None
+    return table_data_selection(arguments.table_data_include or ['*'],arguments.table_data_exclude,arguments.table_data_limit,arguments.table_data_format)
+
+def _object_filter(arguments):
+    '''Returns the object filter asked for on the command line.'''
+    return object_filter(arguments.kind,arguments.include,arguments.exclude)
+
+def _parse_arguments():
+    '''Parses the command line arguments.'''
+
+    parser = argparse.ArgumentParser(description = 'Exports the modules, queries and tables of an MS Access database as plaintext files.')
+    parser.add_argument('file_path', nargs = '?', default = '', help = 'path to the MS Access file (a file dialog is shown if omitted)')
+    parser.add_argument('pretty_print_sql', nargs = '?', default = 'False', help = 'pass "True" to prettify the SQL of the queries')
+    parser.add_argument('--full', action = 'store_true', help = 're-mine every object even if its DateModified did not change')
+    parser.add_argument('--profile', nargs = '?', const = '', default = None, metavar = 'REPORT_PATH', help = 'write a JSON report of the time spent in each phase and on each object (to git_exports/.cache/profile.json by default)')
+    parser.add_argument('--vbe', action = 'store_true', help = 'read the code from the VBA project instead of opening every module and form')
+    parser.add_argument('--writers', type = int, default = 4, help = 'number of threads writing files while the objects are mined')
+    parser.add_argument('--output-dir', help = 'write the files to this directory instead of git_exports next to the database')
+    parser.add_argument('--batch', nargs = '+', metavar = 'PATH_OR_GLOB', help = 'export every database matched by these paths or glob patterns in parallel worker processes')
+    parser.add_argument('--workers', type = int, default = min(4,os.cpu_count() or 1), help = 'number of databases exported at the same time in batch mode')
+    parser.add_argument('--timeout', type = float, default = 3600, help = 'seconds after which a database is abandoned in batch mode')
+    parser.add_argument('--daemon', action = 'store_true', help = 'keep Access running and serve export requests on a local port')
+    parser.add_argument('--via-daemon', action = 'store_true', help = 'hand the export over to a running daemon (exporting in-process if none is listening)')
+    parser.add_argument('--stop-daemon', action = 'store_true', help = 'stop a running daemon')
+    parser.add_argument('--port', type = int, default = 47511, help = 'local port of the daemon')
+    parser.add_argument('--max-jobs', type = int, default = 50, help = 'exports after which the daemon restarts Access')
+    parser.add_argument('--backend', choices = ['com','fake'], default = 'com', help = 'use MS Access through COM (default) or the in-process fake, in which case file_path is a JSON or directory fixture')
+    parser.add_argument('--uses', metavar = 'NAME', help = 'list the objects and procedures the object named NAME refers to (from the index of the last export)')
+    parser.add_argument('--used-by', metavar = 'NAME', help = 'list the objects that refer to the object or procedure named NAME (from the index of the last export)')
+    parser.add_argument('--defines', metavar = 'NAME', help = 'list where the procedure named NAME is declared (from the index of the last export)')
+    parser.add_argument('--pack', metavar = 'PACK_PATH', help = 'also add the exported files to this single-file pack as a snapshot (only new content is stored)')
+    parser.add_argument('--snapshot', metavar = 'NAME', help = 'name of the snapshot added to the pack (the database name and the time by default; ignored in batch mode)')
+    parser.add_argument('--list-snapshots', metavar = 'PACK_PATH', help = 'list the snapshots of a pack')
+    parser.add_argument('--read-from-pack', nargs = 3, metavar = ('PACK_PATH','SNAPSHOT','FILE'), help = 'print one file (e.g. modules/Module1.bas) of a snapshot of a pack')
+    parser.add_argument('--unpack', nargs = 3, metavar = ('PACK_PATH','SNAPSHOT','DIRECTORY'), help = 'write the files of a snapshot of a pack to a directory laid out like git_exports')
+    parser.add_argument('--import', dest = 'import_directory', metavar = 'EXPORTS_DIR', help = 'rebuild the database at file_path (creating it if needed) from the modules, queries and tables of an exports directory, only touching the objects that differ')
+    parser.add_argument('--watch', action = 'store_true', help = 'attach to the MS Access instance that has the database open and keep exporting the objects that change')
+    parser.add_argument('--interval', type = float, default = 2.0, help = 'seconds between two looks for changes in watch mode')
+    parser.add_argument('--kind', action = 'append', choices = object_filter.all_kinds, help = 'only export objects of this kind (can be repeated)')
+    parser.add_argument('--include', action = 'append', default = [], metavar = '[KIND:]PATTERN', help = 'only export the objects whose name matches this glob (or "re:" regular expression), optionally only for one kind (can be repeated)')
+    parser.add_argument('--exclude', action = 'append', default = [], metavar = '[KIND:]PATTERN', help = 'never export the objects whose name matches this glob (or "re:" regular expression), optionally only for one kind (can be repeated)')
+    parser.add_argument('--changed-only', action = 'store_true', help = 'only export the objects modified since the last export, leaving the files of the others as they are')
+    parser.add_argument('--newline', choices = ['lf','crlf'], default = 'lf', help = 'newlines of the exported files (which are always UTF-8)')
+    parser.add_argument('--verify', action = 'store_true', help = 'write nothing; report which files would change and whether semantically or only cosmetically')
+    parser.add_argument('--save-as-text', action = 'store_true', help = 'also export the definitions of forms, reports and macros with SaveAsText')
+    parser.add_argument('--table-data', action = 'store_true', help = 'also export the rows of the tables to git_exports/table_data')
+    parser.add_argument('--table-data-include', action = 'append', metavar = 'PATTERN', help = 'only export the rows of the tables matching this glob pattern (can be repeated)')
+    parser.add_argument('--table-data-exclude', action = 'append', default = [], metavar = 'PATTERN', help = 'never export the rows of the tables matching this glob pattern (can be repeated)')
+    parser.add_argument('--table-data-limit', action = 'append', default = [], type = _row_limit_argument, metavar = '[PATTERN=]ROWS', help = 'export at most this many rows of the tables matching the pattern (of every table if no pattern is given); the last matching limit wins')
+    parser.add_argument('--table-data-format', choices = ['csv','jsonl'], default = 'csv', help = 'file format of the exported rows')
+    parser.add_argument('--com-timeout', type = float, default = 300, metavar = 'SECONDS', help = 'terminate MS Access (ending the export) if a single COM call takes longer than this; 0 disables the timeout')
+    parser.add_argument('--late-bound', action = 'store_true', help = 'talk to MS Access through late-bound COM dispatch instead of generating early-bound wrappers')
+    return parser.parse_intermixed_args()
+
+def _look_up_index(arguments):
+    '''Answers the --uses, --used-by and --defines lookups from the cross-reference index of an exports directory.'''
+
+    location = export_location()
+    location.db_path = arguments.file_path
+    location.requested_export_directory_path = arguments.output_dir
+    if not arguments.file_path and not arguments.output_dir:
+        print('Give the database (or the --output-dir) whose exports are looked up.')
+        return False
+    index_path = os.path.join(location.cache_directory_path,object_index.file_name)
+    if not os.path.isfile(index_path):
+        print('There is no index at "' + index_path + '". Export the database first.')
+        return False
+
+    index = object_index(index_path)
+    try:
+        started = time.perf_counter()
+        lines = []
+        if arguments.uses:
+            lines += ['"' + arguments.uses + '" uses:'] + (['  ' + kind + ' ' + name + ' (' + path + ')' for kind,name,path in index.uses(arguments.uses)] or ['  nothing'])
+        if arguments.used_by:
+            lines += ['"' + arguments.used_by + '" is used by:'] + (['  ' + kind + ' ' + name + ' (' + path + ', ' + reference_kind + ')'
+                                                                    for kind,name,path,reference_kind in index.used_by(arguments.used_by)] or ['  nothing'])
+        if arguments.defines:
+            lines += ['"' + arguments.defines + '" is defined in:'] + (['  ' + path + ':' + str(line) + ' (' + ('private ' if private else '') + kind + ')'
+                                                                       for path,line,kind,private in index.defines(arguments.defines)] or ['  nowhere'])
+        seconds = time.perf_counter() - started
+    finally:
+        index.close()
+
+    print('\n'.join(lines))
+    print('Looked up in ' + str(round(seconds * 1000,1)) + ' ms.')
+    return True
+
+def _daemon_authkey():
+    '''Returns the key the export daemon and its clients authenticate each other with: the ACCESS_DB_EXPORTER_AUTHKEY
+    environment variable if it is set, otherwise a random key kept in a file only the current user can read (created
+    the first time it is needed).'''
+
+    if os.environ.get('ACCESS_DB_EXPORTER_AUTHKEY'): return os.environ['ACCESS_DB_EXPORTER_AUTHKEY'].encode()
+
+    # The file is created with owner-only permissions. On Windows those are ignored, but the profile directory it lives
+    # in is only open to its user.
+    key_path = os.path.join(os.path.expanduser('~'),'.access_db_exporter_daemon.key')
+    try:
+        descriptor = os.open(key_path,os.O_CREAT | os.O_EXCL | os.O_WRONLY,0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(descriptor,mode = 'w') as file:
+            file.write(secrets.token_hex(32))
+
+    # Another process may have created the file a moment ago and still be writing it.
+    started = time.perf_counter()
+    while True:
+        if os.name == 'posix' and os.stat(key_path).st_mode & 0o077: os.chmod(key_path,0o600)
+        with open(file = key_path,mode = 'r') as file:
+            authkey = file.read().strip()
+        if authkey or time.perf_counter() - started > 5: break
+        time.sleep(0.05)
+    if not authkey: raise ValueError('The daemon key file "' + key_path + '" is empty. Delete it to make a new key.')
+    return authkey.encode()
+
+def _use_pack(arguments):
+    '''Lists the snapshots of a pack, prints a file of a snapshot or unpacks a snapshot.'''
+
+    try:
+        if arguments.list_snapshots:
+            pack = snapshot_pack(arguments.list_snapshots)
+            for snapshot_name in pack.snapshot_names():
+                snapshot = pack.snapshot(snapshot_name)
+                print(snapshot_name + ': ' + str(len(snapshot['files'])) + ' files from ' + snapshot.get('database','?') + ' (' + snapshot.get('created','?') + ')')
+        if arguments.read_from_pack:
+            pack_path,snapshot_name,relative_name = arguments.read_from_pack
+            sys.stdout.buffer.write(snapshot_pack(pack_path).read(snapshot_name,relative_name.replace('\\','/')))
+            sys.stdout.flush()
+        if arguments.unpack:
+            pack_path,snapshot_name,directory_path = arguments.unpack
+            file_count = snapshot_pack(pack_path).unpack(snapshot_name,directory_path)
+            print('Unpacked ' + str(file_count) + ' files of "' + snapshot_name + '" to: ' + os.path.abspath(directory_path))
+    except (OSError,KeyError,ValueError,zipfile.BadZipFile) as error:
+        print('Could not use the pack: ' + str(error))
+        return False
+    return True
+
+def _worker_arguments(arguments):
+    '''Returns the command line arguments that every worker of a batch export gets (besides its database and directory).'''
+
+    worker_arguments = [arguments.pretty_print_sql,'--backend',arguments.backend]
+    if arguments.full: worker_arguments += ['--full']
+    if arguments.vbe: worker_arguments += ['--vbe']
+    if arguments.late_bound: worker_arguments += ['--late-bound']
+    if arguments.save_as_text: worker_arguments += ['--save-as-text']
+    if arguments.verify: worker_arguments += ['--verify']
+    worker_arguments += ['--newline',arguments.newline]
+    if arguments.changed_only: worker_arguments += ['--changed-only']
+    for kind in arguments.kind or []: worker_arguments += ['--kind',kind]
+    for pattern in arguments.include: worker_arguments += ['--include',pattern]
+    for pattern in arguments.exclude: worker_arguments += ['--exclude',pattern]
+    if arguments.table_data:
+        worker_arguments += ['--table-data','--table-data-format',arguments.table_data_format]
+        for pattern in arguments.table_data_include or []: worker_arguments += ['--table-data-include',pattern]
+        for pattern in arguments.table_data_exclude: worker_arguments += ['--table-data-exclude',pattern]
+        for pattern,rows in arguments.table_data_limit: worker_arguments += ['--table-data-limit',pattern + '=' + str(rows)]
+    worker_arguments += ['--writers',str(arguments.writers),'--com-timeout',str(arguments.com_timeout)]
+
+    # Every worker adds its own snapshot, named after its database.
+    if arguments.pack: worker_arguments += ['--pack',os.path.abspath(arguments.pack)]
+
+    # Every worker writes its profile to its own exports directory.
+    if arguments.profile is not None: worker_arguments += ['--profile']
+    return worker_arguments
+
+def _main(arguments):
+    '''Runs the mode selected on the command line and returns true if it succeeded.'''
+
+    backend = fake_access_backend() if arguments.backend == 'fake' else com_access_backend(early_bound = not arguments.late_bound)
+
+    # The daemon and its clients share a key only this user can read, so other local processes (and other users) can't
+    # drive Access through the port. The key is only made by the modes that talk to the daemon.
+    address = ('localhost', arguments.port)
+
+    if arguments.uses or arguments.used_by or arguments.defines:
+        return _look_up_index(arguments)
+
+    if arguments.list_snapshots or arguments.read_from_pack or arguments.unpack:
+        return _use_pack(arguments)
+
+    if arguments.daemon:
+        export_daemon(backend, address, _daemon_authkey(), arguments.max_jobs).serve()
+        return True
+
+    if arguments.stop_daemon:
+        reply = export_client(address, _daemon_authkey()).request(stop = True)
+        print('No export daemon is listening on port ' + str(arguments.port) + '.' if reply is None else reply['output'], end = '\n' if reply is None else '')
+        return reply is not None
+
+    if arguments.import_directory is not None:
+        if not arguments.file_path:
+            print('The database to import into has to be given.')
+            return False
+        return database_importer(backend, arguments.com_timeout).run(os.path.abspath(arguments.file_path), arguments.import_directory)
+
+    if arguments.batch is not None:
+        b = batch_automation(backend, arguments.workers, arguments.timeout)
+        return b.run(arguments.batch + ([arguments.file_path] if arguments.file_path else []), _worker_arguments(arguments))
+
+    if arguments.watch:
+        w = export_watcher(backend, os.path.abspath(arguments.file_path) if arguments.file_path else None, arguments.interval)
+        return w.watch(
+            pretty_print_sql = arguments.pretty_print_sql == 'True',
+            profile_path = arguments.profile,
+            export_directory_path = arguments.output_dir,
+            writer_count = arguments.writers,
+            table_data = _table_data_selection(arguments),
+            save_as_text = arguments.save_as_text,
+            newline = arguments.newline,
+            objects = _object_filter(arguments)
+        )
+
+    if arguments.via_daemon and arguments.file_path:
+        reply = export_client(address, _daemon_authkey()).request(
+            db_path = os.path.abspath(arguments.file_path),
+            pretty_print_sql = arguments.pretty_print_sql == 'True',
+            full_export = arguments.full,
+            profile_path = os.path.abspath(arguments.profile) if arguments.profile else arguments.profile,
+            read_code_from_vbe = arguments.vbe,
+            export_directory_path = os.path.abspath(arguments.output_dir) if arguments.output_dir else None,
+            writer_count = arguments.writers,
+            table_data = vars(_table_data_selection(arguments)) if arguments.table_data else None,
+            save_as_text = arguments.save_as_text,
+            newline = arguments.newline,
+            verify_only = arguments.verify,
+            objects = vars(_object_filter(arguments)),
+            changed_only = arguments.changed_only,
+            com_timeout = arguments.com_timeout,
+            pack_path = os.path.abspath(arguments.pack) if arguments.pack else None,
+            snapshot_name = arguments.snapshot
+        )
+        if reply is not None:
+            print(reply['output'], end = '')
+            return reply['exported']
+        print('No export daemon is listening on port ' + str(arguments.port) + '. Exporting in-process.')
+
+    # Get the MS Access file's fully qualified path from command line argument (if it was provided). Otherwise pass in an
+    # empty string.
+    a = automation(backend)
+    a.process_id_path = os.environ.get('ACCESS_DB_EXPORTER_PID_FILE')
+    return a.run(
+        arguments.file_path,
+        pretty_print_sql = arguments.pretty_print_sql == 'True',
+        full_export = arguments.full,
+        profile_path = arguments.profile,
+        read_code_from_vbe = arguments.vbe,
+        export_directory_path = arguments.output_dir,
+        writer_count = arguments.writers,
+        table_data = _table_data_selection(arguments),
+        save_as_text = arguments.save_as_text,
+        newline = arguments.newline,
+        verify_only = arguments.verify,
+        objects = _object_filter(arguments),
+        changed_only = arguments.changed_only,
+        com_timeout = arguments.com_timeout,
+        pack_path = arguments.pack,
+        snapshot_name = arguments.snapshot
+    )
 
+if __name__ == '__main__':
+    sys.exit(0 if _main(_parse_arguments()) else 1)
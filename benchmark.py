@@ -0,0 +1,155 @@
+'''Drives the export pipeline against synthetic databases of growing size (through the fake Access backend) and reports
+the throughput and peak memory of each run as JSON, optionally comparing them with a previous report.'''
+
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+from access_db_exporter import automation, fake_access_backend
+
+class synthetic_database():
+    '''Builds the fixture of a fake database with a given number of objects.'''
+
+    def __init__(self,object_count,lines_per_module = 40,fields_per_table = 12):
+        self.object_count = object_count
+        self.lines_per_module = lines_per_module
+        self.fields_per_table = fields_per_table
+
+    def fixture(self):
+        '''Returns the fixture. Half of the objects are modules and the rest are split between forms, queries and tables.'''
+
+        def _code(name):
+            '''Returns the VBA code of a synthetic module.'''
+            lines = ['Option Compare Database','Option Explicit','']
+            for procedure_number in range(max(1,self.lines_per_module // 4)):
+                lines += [
+                    'Public Function ' + name + '_' + str(procedure_number) + '(ByVal value As Long) As Long',
+                    '    ' + name + '_' + str(procedure_number) + ' = value * ' + str(procedure_number),
+                    'End Function',
+                    ''
+                ]
+            return '\r\n'.join(lines)
+
+        def _fields():
+            '''Returns the field definitions of a synthetic table.'''
+            return [{'name' : 'Field' + str(field_number), 'type' : 10, 'required' : False, 'size' : 255, 'allow_zero_length' : True}
+                    for field_number in range(self.fields_per_table)]
+
+        module_count = self.object_count // 2
+        form_count = query_count = (self.object_count - module_count) // 3
+        table_count = self.object_count - module_count - form_count - query_count
+
+        return {
+            'modules' : [{'name' : 'Module' + str(number), 'type' : number % 2, 'code' : _code('Module' + str(number)), 'date_modified' : '2020-01-01'}
+                         for number in range(module_count)],
+            'forms' : [{'name' : 'Form' + str(number), 'code' : _code('Form' + str(number)) if number % 2 == 0 else None, 'date_modified' : '2020-01-01'}
+                       for number in range(form_count)],
+            'queries' : [{'name' : 'Query' + str(number), 'sql' : 'SELECT * FROM Table' + str(number % max(1,table_count)) + ';', 'date_modified' : '2020-01-01'}
+                         for number in range(query_count)],
+            'tables' : [{'name' : 'Table' + str(number), 'fields' : _fields(), 'date_modified' : '2020-01-01'}
+                        for number in range(table_count)]
+        }
+
+class benchmark():
+    '''Runs the whole pipeline (mining and file export) on synthetic databases and measures each run.'''
+
+    def run(self,sizes,working_directory):
+        '''Exports a database of every size twice: a cold run into an empty directory and a warm run with nothing changed.'''
+
+        def _export(fixture_path,run_name,object_count):
+            '''Runs one export and returns its measurements.'''
+
+            exporter = automation(fake_access_backend())
+            profile_path = os.path.join(working_directory,'profile.json')
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                exporter.run(fixture_path,profile_path = profile_path)
+            seconds = time.perf_counter() - started
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            with open(file = profile_path,mode = 'r') as file:
+                phases = {phase['name'] : phase['seconds'] for phase in json.load(file)['phases']}
+
+            return {
+                'objects' : object_count,
+                'run' : run_name,
+                'seconds' : seconds,
+                'objects_per_second' : object_count / seconds,
+                'peak_memory_bytes' : peak_memory,
+                'phase_seconds' : phases
+            }
+
+        results = []
+        for object_count in sizes:
+            database_directory = os.path.join(working_directory,str(object_count))
+            os.makedirs(database_directory)
+            fixture_path = os.path.join(database_directory,'database.json')
+            with open(file = fixture_path,mode = 'w') as file:
+                json.dump(synthetic_database(object_count).fixture(),file)
+
+            print('Benchmarking ' + str(object_count) + ' objects...',end = ' ',file = sys.stderr)
+            results += [_export(fixture_path,'cold',object_count)]
+            results += [_export(fixture_path,'warm',object_count)]
+            print('Done!!!',file = sys.stderr)
+
+            shutil.rmtree(database_directory)
+
+        return results
+
+def _regressions(results,baseline,tolerance):
+    '''Lists the runs that are slower or use more memory than the same run in the baseline (beyond the tolerance).'''
+
+    baseline_runs = {(result['objects'],result['run']) : result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        previous = baseline_runs.get((result['objects'],result['run']))
+        if previous is None: continue
+        if result['objects_per_second'] < previous['objects_per_second'] * (1 - tolerance):
+            regressions += [str(result['objects']) + ' objects (' + result['run'] + '): throughput fell from ' +
+                            str(round(previous['objects_per_second'])) + ' to ' + str(round(result['objects_per_second'])) + ' objects/sec']
+        if result['peak_memory_bytes'] > previous['peak_memory_bytes'] * (1 + tolerance):
+            regressions += [str(result['objects']) + ' objects (' + result['run'] + '): peak memory grew from ' +
+                            str(previous['peak_memory_bytes']) + ' to ' + str(result['peak_memory_bytes']) + ' bytes']
+    return regressions
+
+def _parse_arguments():
+    '''Parses the command line arguments.'''
+
+    parser = argparse.ArgumentParser(description = 'Benchmarks the export pipeline against synthetic databases of growing size.')
+    parser.add_argument('--sizes', nargs = '+', type = int, default = [100,1000,10000], help = 'number of objects of each synthetic database')
+    parser.add_argument('--output', help = 'write the JSON report to this file instead of the standard output')
+    parser.add_argument('--baseline', help = 'a previous JSON report to compare throughput and peak memory against')
+    parser.add_argument('--tolerance', type = float, default = 0.2, help = 'relative slowdown or memory growth tolerated before reporting a regression')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+
+    arguments = _parse_arguments()
+    working_directory = tempfile.mkdtemp(prefix = 'access_db_exporter_benchmark_')
+    try:
+        report = {'results' : benchmark().run(arguments.sizes,working_directory)}
+    finally:
+        shutil.rmtree(working_directory,ignore_errors = True)
+
+    if arguments.baseline is not None:
+        with open(file = arguments.baseline,mode = 'r') as file:
+            report['regressions'] = _regressions(report['results'],json.load(file),arguments.tolerance)
+
+    if arguments.output is not None:
+        with open(file = arguments.output,mode = 'w') as file:
+            json.dump(report,file,indent = 2)
+    else:
+        print(json.dumps(report,indent = 2))
+
+    for regression in report.get('regressions',[]):
+        print('Regression: ' + regression,file = sys.stderr)
+    sys.exit(1 if report.get('regressions') else 0)
@@ -0,0 +1,440 @@
+'''Tests of the exporter, run against the in-process fake Access backend (no Windows or MS Access needed).'''
+
+import os
+import io
+import json
+import contextlib
+import threading
+import zipfile
+import sqlite3
+import sys
+import subprocess
+import pytest
+import access_db_exporter
+from access_db_exporter import automation, fake_access_backend, object_filter, table_data_selection, database_importer, file_lock, file_export_automation, snapshot_pack, sql_formatter, export_daemon, com_call_layer
+
+def _fixture():
+    '''Returns the fixture of a small database with one object of every kind.'''
+    return {
+        'modules' : [{'name' : 'Module1', 'type' : 0, 'code' : 'Option Compare Database\r\n\r\nPublic Sub Hello()\r\n    MsgBox "hi"\r\nEnd Sub', 'date_modified' : '2020-01-01'}],
+        'forms' : [{'name' : 'Form1', 'code' : 'Private Sub Form_Load()\r\nEnd Sub', 'date_modified' : '2020-01-01'},
+                   {'name' : 'Form2', 'code' : None, 'date_modified' : '2020-01-01'}],
+        'queries' : [{'name' : 'Query1', 'sql' : 'SELECT ID, Name FROM Table1 WHERE ID > 1;', 'date_modified' : '2020-01-01'}],
+        'tables' : [{'name' : 'Table1', 'fields' : [{'name' : 'ID', 'type' : 4, 'required' : True, 'size' : 4}, {'name' : 'Name', 'type' : 10}],
+                     'indexes' : [{'name' : 'PrimaryKey', 'primary' : True, 'unique' : True, 'fields' : [{'name' : 'ID'}]}],
+                     'rows' : [[1, 'Ann'], [2, 'Bob']], 'date_modified' : '2020-01-01'}],
+        'reports' : [{'name' : 'Report1', 'date_modified' : '2020-01-01'}],
+        'macros' : [{'name' : 'Macro1', 'date_modified' : '2020-01-01'}]
+    }
+
+@pytest.fixture
+def database(tmp_path):
+    '''Writes the fixture to a JSON "database" and returns its path.'''
+    db_path = tmp_path / 'db.json'
+    db_path.write_text(json.dumps(_fixture()))
+    return str(db_path)
+
+def _export(db_path,**options):
+    '''Exports the database with the fake backend and returns what was printed.'''
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        assert automation(fake_access_backend()).run(db_path,**options)
+    return output.getvalue()
+
+def _exported_files(db_path):
+    '''Returns the relative names of the files in the exports directory (without its cache).'''
+    export_directory_path = os.path.join(os.path.dirname(db_path),'git_exports')
+    return sorted(os.path.relpath(os.path.join(directory_path,file_name),export_directory_path).replace(os.sep,'/')
+                  for directory_path,directory_names,file_names in os.walk(export_directory_path)
+                  if '.cache' not in os.path.relpath(directory_path,export_directory_path).split(os.sep)
+                  for file_name in file_names)
+
+def test_files_of_options_left_out_are_kept(database):
+    _export(database,save_as_text = True,table_data = table_data_selection())
+    written = _exported_files(database)
+    assert {'forms/Form1.txt','forms/Form2.txt','reports/Report1.txt','macros/Macro1.txt','table_data/Table1.csv'} <= set(written)
+
+    # A plain export (like the pre-commit hook's) must not delete what the other one wrote.
+    output = _export(database)
+    assert 'Removed:' not in output
+    assert _exported_files(database) == written
+
+    # Until the export is asked for again and the object is really gone.
+    fixture = _fixture()
+    fixture['reports'] = []
+    with open(file = database,mode = 'w') as file: file.write(json.dumps(fixture))
+    output = _export(database,save_as_text = True,table_data = table_data_selection())
+    assert 'Removed: reports/Report1.txt' in output
+    assert 'reports/Report1.txt' not in _exported_files(database)
+
+def _change_module(db_path):
+    '''Changes the code of Module1 and its DateModified, as Access does.'''
+    fixture = _fixture()
+    fixture['modules'][0]['code'] += '\r\n\r\nPublic Sub Bye()\r\nEnd Sub'
+    fixture['modules'][0]['date_modified'] = '2021-01-01'
+    with open(file = db_path,mode = 'w') as file: file.write(json.dumps(fixture))
+
+def test_unchanged_objects_are_not_rewritten(database):
+    _export(database)
+    export_directory_path = os.path.join(os.path.dirname(database),'git_exports')
+    written = [name for name in _exported_files(database) if name != 'manifest.json']
+    for relative_name in written: os.utime(os.path.join(export_directory_path,relative_name),(0,0))
+
+    output = _export(database)
+    assert output.splitlines()[-1] == '0 added, 0 changed, 0 removed, ' + str(len(written)) + ' unchanged'
+    assert all(os.path.getmtime(os.path.join(export_directory_path,relative_name)) == 0 for relative_name in written)
+
+    _change_module(database)
+    output = _export(database)
+    assert 'Changed: modules/Module1.bas' in output
+    assert output.splitlines()[-1] == '0 added, 1 changed, 0 removed, ' + str(len(written) - 1) + ' unchanged'
+    assert [relative_name for relative_name in written if os.path.getmtime(os.path.join(export_directory_path,relative_name)) != 0] == ['modules/Module1.bas']
+
+def test_objects_outside_the_filter_are_neither_exported_nor_removed(database):
+    _export(database,objects = object_filter(kinds = ['modules','queries']))
+    assert _exported_files(database) == ['manifest.json','modules/Module1.bas','queries/Query1.txt']
+
+    output = _export(database,objects = object_filter(include = ['re:^(Module|Table)1$'],exclude = ['queries:*']))
+    assert 'Removed:' not in output
+    assert _exported_files(database) == ['manifest.json','modules/Module1.bas','queries/Query1.txt','tables/Table1.txt']
+
+def test_changed_only_looks_at_objects_whose_date_modified_changed(database):
+    _export(database)
+    fixture = _fixture()
+    fixture['modules'][0]['code'] += '\r\n\r\nPublic Sub Bye()\r\nEnd Sub'
+    fixture['modules'][0]['date_modified'] = '2021-01-01'
+    # Access didn't move the date of the query, so an export of changed objects doesn't open it.
+    fixture['queries'][0]['sql'] = 'SELECT ID FROM Table1;'
+    with open(file = database,mode = 'w') as file: file.write(json.dumps(fixture))
+
+    output = _export(database,changed_only = True)
+    assert 'Changed: modules/Module1.bas' in output
+    assert 'queries/Query1.txt' not in output
+    assert 'Removed:' not in output
+
+    output = _export(database,full_export = True)
+    assert 'Changed: queries/Query1.txt' in output
+
+def test_changed_only_picks_up_changes_that_were_only_verified(database):
+    _export(database)
+    _change_module(database)
+    assert 'Semantic: modules/Module1.bas' in _export(database,verify_only = True)
+
+    output = _export(database,changed_only = True)
+    assert 'Changed: modules/Module1.bas' in output
+    with open(file = os.path.join(os.path.dirname(database),'git_exports','modules','Module1.bas'),mode = 'r') as file: assert 'Bye' in file.read()
+
+def test_changed_only_picks_up_changes_of_an_export_that_failed(database,monkeypatch):
+    _export(database)
+    _change_module(database)
+    def _failing_publish(self): raise OSError('disk full')
+    with monkeypatch.context() as patch:
+        patch.setattr(file_export_automation,'_publish',_failing_publish)
+        with pytest.raises(OSError), contextlib.redirect_stdout(io.StringIO()):
+            automation(fake_access_backend()).run(database)
+
+    output = _export(database,changed_only = True)
+    assert 'Changed: modules/Module1.bas' in output
+    assert _export(database,changed_only = True).splitlines()[-1].startswith('0 added, 0 changed, 0 removed')
+
+def test_csv_table_data_tells_null_from_the_empty_string(database):
+    fixture = _fixture()
+    fixture['tables'][0]['rows'] = [[1, 'Ann'], [2, ''], [3, None], [4, 'Smith, "Bob"']]
+    with open(file = database,mode = 'w') as file: file.write(json.dumps(fixture))
+
+    _export(database,table_data = table_data_selection())
+    with open(file = os.path.join(os.path.dirname(database),'git_exports','table_data','Table1.csv'),mode = 'r',newline = '') as file:
+        assert file.read() == 'ID,Name\n1,Ann\n2,""\n3,\n4,"Smith, ""Bob"""\n'
+
+def _import(db_path,export_directory_path):
+    '''Imports an exports directory into the database with the fake backend and returns what was printed.'''
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        assert database_importer(fake_access_backend()).run(db_path,export_directory_path)
+    return output.getvalue()
+
+@pytest.mark.parametrize('pretty_print_sql',[False,True])
+def test_importing_an_export_into_its_database_changes_nothing(database,pretty_print_sql):
+    _export(database,pretty_print_sql = pretty_print_sql)
+    with open(file = database,mode = 'r') as file: fixture = file.read()
+
+    output = _import(database,os.path.join(os.path.dirname(database),'git_exports'))
+    assert output.splitlines()[-1].startswith('0 imported, ')
+    with open(file = database,mode = 'r') as file: assert file.read() == fixture
+
+def test_import_rebuilds_the_exported_objects(database,tmp_path):
+    _export(database,pretty_print_sql = True)
+    rebuilt_path = str(tmp_path / 'rebuilt.json')
+    output = _import(rebuilt_path,os.path.join(os.path.dirname(database),'git_exports'))
+    assert 'Imported: modules/Module1.bas' in output
+    assert 'Imported: queries/Query1.txt' in output
+    assert 'Imported: tables/Table1.txt' in output
+    assert 'Skipped: modules/Form_Form1.cls (form modules are imported with their forms)' in output
+
+    # The rebuilt database matches the files, so importing them again changes nothing.
+    with open(file = rebuilt_path,mode = 'r') as file: rebuilt = json.load(file)
+    assert [query['name'] for query in rebuilt['queries']] == ['Query1']
+    assert _import(rebuilt_path,os.path.join(os.path.dirname(database),'git_exports')).splitlines()[-1].startswith('0 imported, ')
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'),reason = 'emulates the fsync of Windows with /proc and fcntl')
+def test_publishing_flushes_files_through_handles_that_can_write(database,monkeypatch):
+    import fcntl
+    real_fsync = os.fsync
+    def _windows_fsync(descriptor):
+        # Windows flushes files (_commit) only through handles that can write to them.
+        if os.path.isfile('/proc/self/fd/' + str(descriptor)) and fcntl.fcntl(descriptor,fcntl.F_GETFL) & os.O_ACCMODE == os.O_RDONLY:
+            raise OSError(9,'Bad file descriptor')
+        real_fsync(descriptor)
+    monkeypatch.setattr(os,'fsync',_windows_fsync)
+
+    _export(database)
+    assert 'modules/Module1.bas' in _exported_files(database)
+
+def test_exports_of_the_same_directory_take_turns(database):
+    _export(database)
+    cache_directory_path = os.path.join(os.path.dirname(database),'git_exports','.cache')
+
+    # Another export holds the lock, so this one waits for it before touching the staging directory.
+    lock = file_lock(os.path.join(cache_directory_path,'export.lock'))
+    lock.acquire()
+    outputs = []
+    export = threading.Thread(target = lambda: outputs.append(_export(database)))
+    export.start()
+    export.join(0.5)
+    assert export.is_alive()
+
+    lock.release()
+    export.join(10)
+    assert 'Waiting for another export of this directory to finish...' in outputs[0]
+
+def test_normalized_drops_only_the_attributes_that_carry_nothing():
+    code = ('Attribute VB_Name = "Class1"\r\nAttribute VB_GlobalNameSpace = False\r\nAttribute VB_Creatable = False\r\n'
+            'Attribute VB_PredeclaredId = True\r\nAttribute VB_Exposed = False\r\nOption Explicit  \r\n\r\n\r\n')
+    normalizer = file_export_automation()
+    assert normalizer._normalized('module',code) == 'Attribute VB_PredeclaredId = True\nAttribute VB_Exposed = False\nOption Explicit\n'
+    normalizer.newline = 'crlf'
+    assert normalizer._normalized('module','Option Explicit\n') == 'Option Explicit\r\n'
+    assert normalizer._normalized('table',{'name' : 'T', 'indexes' : [{'name' : 'b'},{'name' : 'a'}]}) == (
+        '{\r\n  "indexes": [\r\n    {\r\n      "name": "a"\r\n    },\r\n    {\r\n      "name": "b"\r\n    }\r\n  ],\r\n  "name": "T"\r\n}\r\n')
+
+def test_verify_tells_cosmetic_from_semantic_changes_and_writes_nothing(database):
+    _export(database,newline = 'crlf')
+    module_path = os.path.join(os.path.dirname(database),'git_exports','modules','Module1.bas')
+    with open(file = module_path,mode = 'rb') as file: exported = file.read()
+
+    fixture = _fixture()
+    fixture['queries'][0]['sql'] = 'SELECT ID FROM Table1;'
+    with open(file = database,mode = 'w') as file: file.write(json.dumps(fixture))
+    output = _export(database,verify_only = True,full_export = True)
+    assert 'Cosmetic: modules/Module1.bas' in output
+    assert 'Semantic: queries/Query1.txt' in output
+    assert 'Verified only: nothing was written.' in output
+    with open(file = module_path,mode = 'rb') as file: assert file.read() == exported
+
+def test_import_sets_module_attributes_through_a_module_file(database,tmp_path):
+    _export(database)
+    export_directory_path = os.path.join(os.path.dirname(database),'git_exports')
+    with open(file = os.path.join(export_directory_path,'modules','Class1.cls'),mode = 'w',newline = '') as file:
+        file.write('Attribute VB_PredeclaredId = True\nOption Explicit\n')
+
+    rebuilt_path = str(tmp_path / 'rebuilt.json')
+    assert 'Imported: modules/Class1.cls' in _import(rebuilt_path,export_directory_path)
+    with open(file = rebuilt_path,mode = 'r') as file:
+        modules = {module['name'] : module for module in json.load(file)['modules']}
+    assert modules['Class1']['code'].rstrip() == 'Option Explicit'
+    assert _import(rebuilt_path,export_directory_path).splitlines()[-1].startswith('0 imported, ')
+
+def test_pack_round_trip(database,tmp_path):
+    pack_path = str(tmp_path / 'exports.zip')
+    _export(database,pack_path = pack_path,snapshot_name = 'first')
+    exported = [relative_name for relative_name in _exported_files(database) if relative_name != 'manifest.json']
+
+    # The second snapshot holds the same files, so it adds none to the pack.
+    output = _export(database,pack_path = pack_path,snapshot_name = 'second')
+    assert 'Snapshot "second" added to ' + pack_path + ': ' + str(len(exported)) + ' files, 0 of them new to the pack.' in output
+
+    pack = snapshot_pack(pack_path)
+    assert pack.snapshot_names() == ['first','second']
+    export_directory_path = os.path.join(os.path.dirname(database),'git_exports')
+    unpacked_directory_path = str(tmp_path / 'unpacked')
+    assert pack.unpack('first',unpacked_directory_path) == len(exported)
+    for relative_name in exported:
+        with open(file = os.path.join(export_directory_path,*relative_name.split('/')),mode = 'rb') as file:
+            content = file.read()
+        assert pack.read('second',relative_name) == content
+        with open(file = os.path.join(unpacked_directory_path,*relative_name.split('/')),mode = 'rb') as file:
+            assert file.read() == content
+
+def test_pack_append_that_fails_leaves_the_pack_as_it_was(database,tmp_path):
+    pack_path = str(tmp_path / 'exports.zip')
+    _export(database,pack_path = pack_path,snapshot_name = 'first')
+    with open(file = pack_path,mode = 'rb') as file: packed = file.read()
+
+    # The file of the new object is missing, so the append fails halfway.
+    pack = snapshot_pack(pack_path)
+    with pytest.raises(OSError):
+        pack.add_snapshot('second',str(tmp_path / 'missing'),{'modules/Module2.bas' : {'name' : 'Module2', 'kind' : 'module', 'hash' : '0' * 40}})
+    with open(file = pack_path,mode = 'rb') as file: assert file.read() == packed
+    assert not os.path.exists(pack_path + '.journal')
+
+    # An append cut short by the death of its process (after journaling the central directory and overwriting it) is
+    # undone by the next one.
+    with zipfile.ZipFile(pack_path) as zip_file: central_directory_offset = zip_file.start_dir
+    with open(file = pack_path + '.journal',mode = 'wb') as file:
+        file.write(str(central_directory_offset).encode('ascii') + b'\n' + packed[central_directory_offset:])
+    with open(file = pack_path,mode = 'r+b') as file:
+        file.seek(central_directory_offset)
+        file.write(b'half an object' * 100)
+    pack.add_snapshot('second',os.path.join(os.path.dirname(database),'git_exports'),{})
+    assert pack.snapshot_names() == ['first','second']
+    with open(file = os.path.join(os.path.dirname(database),'git_exports','modules','Module1.bas'),mode = 'rb') as file:
+        assert pack.read('first','modules/Module1.bas') == file.read()
+    assert not os.path.exists(pack_path + '.journal')
+
+def test_snapshot_names_cannot_leave_the_pack(database,tmp_path):
+    for snapshot_name in ['../escape','a/b','a\\b','..']:
+        assert not snapshot_pack.is_valid_name(snapshot_name)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            assert not automation(fake_access_backend()).run(database,pack_path = str(tmp_path / 'exports.zip'),snapshot_name = snapshot_name)
+        assert 'is not a valid snapshot name' in output.getvalue()
+    with pytest.raises(ValueError):
+        snapshot_pack(str(tmp_path / 'exports.zip')).add_snapshot('../escape',str(tmp_path),{})
+
+def test_an_index_that_cannot_be_updated_does_not_fail_the_export(database):
+    _export(database)
+    index_path = os.path.join(os.path.dirname(database),'git_exports','.cache','index.sqlite')
+
+    # A lookup holding a write lock on the index keeps the export from updating it.
+    fixture = _fixture()
+    fixture['queries'][0].update(sql = 'SELECT ID FROM Table1;',date_modified = '2020-01-02')
+    with open(file = database,mode = 'w') as file: file.write(json.dumps(fixture))
+    lookup = sqlite3.connect(index_path,timeout = 0)
+    lookup.execute('BEGIN EXCLUSIVE')
+    try:
+        output = _export(database)
+    finally:
+        lookup.close()
+    assert 'Changed: queries/Query1.txt' in output
+    assert 'Could not update the cross-reference index' in output
+    assert not os.path.exists(index_path)
+
+def test_sql_formatter_tokens():
+    assert sql_formatter()._tokens("select [Order Date], 'It''s', #1/2/2020#, 1.5e3 from T left join U on T.Option <> U.x") == [
+        ('keyword','SELECT'),('bracketed','[Order Date]'),('punctuation',','),('string',"'It''s'"),('punctuation',','),
+        ('date','#1/2/2020#'),('punctuation',','),('number','1.5e3'),('keyword','FROM'),('word','T'),('keyword','LEFT JOIN'),
+        ('word','U'),('keyword','ON'),('word','T'),('punctuation','.'),('word','Option'),('operator','<>'),('word','U'),
+        ('punctuation','.'),('word','x')
+    ]
+
+def test_sql_formatter_layout():
+    sql = ("select distinct top 5 Left(Name,3) as Initials, Count(*), Left$(Name,3), Format$(d,'yyyy'), Trim$(x) "
+           'from T left join U on T.ID = U.ID where x in (1,2) and y between -1 and 2 order by 1;')
+    assert sql_formatter().format(sql) == '\r\n'.join([
+        'SELECT DISTINCT TOP 5',
+        '  Left(Name, 3) AS Initials,',
+        '  Count(*),',
+        '  Left$(Name, 3),',
+        "  Format$(d, 'yyyy'),",
+        '  Trim$(x)',
+        'FROM',
+        '  T',
+        '  LEFT JOIN U ON T.ID = U.ID',
+        'WHERE',
+        '  x IN (1, 2)',
+        '  AND y BETWEEN -1 AND 2',
+        'ORDER BY',
+        '  1;'
+    ])
+
+def test_sql_formatter_cache_keeps_the_most_recently_used_results(tmp_path):
+    cache_path = str(tmp_path / 'sql_format_cache.json')
+    formatter = sql_formatter()
+    formatter.cache_size_limit = 2
+    for table_name in ['A','B','C']: formatter.format('SELECT * FROM ' + table_name)
+    formatter.format('SELECT * FROM A')
+    formatter.save_cache(cache_path)
+
+    reloaded = sql_formatter()
+    reloaded.load_cache(cache_path)
+    assert sorted(reloaded._formatted.values()) == ['SELECT\r\n  *\r\nFROM\r\n  A','SELECT\r\n  *\r\nFROM\r\n  C']
+
+def test_only_the_daemon_modes_make_the_daemon_key(database,tmp_path,monkeypatch):
+    monkeypatch.setenv('HOME',str(tmp_path))
+    monkeypatch.setenv('USERPROFILE',str(tmp_path))
+    monkeypatch.delenv('ACCESS_DB_EXPORTER_AUTHKEY',raising = False)
+    for arguments in [[database],['--uses','Module1',database]]:
+        monkeypatch.setattr(sys,'argv',['access_db_exporter.py','--backend','fake'] + arguments)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert access_db_exporter._main(access_db_exporter._parse_arguments())
+    assert not os.path.exists(os.path.join(str(tmp_path),'.access_db_exporter_daemon.key'))
+
+def test_the_daemon_refuses_malformed_requests(database):
+    daemon = export_daemon(fake_access_backend(),authkey = b'key')
+    with contextlib.redirect_stdout(io.StringIO()):
+        for request in [{},{'db_path' : 1},{'db_path' : database, 'writer_count' : '4'},{'db_path' : database, 'changed_only' : 1},
+                        {'db_path' : database, 'unknown' : True}]:
+            reply = daemon._export(request)
+            assert reply['exported'] is False and reply['output'].startswith('The export daemon refused the request: ')
+        # Options reach the export under their own names: a verification writes nothing.
+        assert daemon._export({'db_path' : database, 'writer_count' : 2, 'verify_only' : True, 'newline' : 'crlf'})['exported'] is True
+        assert _exported_files(database) == []
+        assert daemon._export({'db_path' : database, 'objects' : {'kinds' : ['queries']}, 'table_data' : None})['exported'] is True
+        assert _exported_files(database) == ['manifest.json','queries/Query1.txt']
+
+def _failing(errors,value = 'done'):
+    '''Returns a function that raises the errors one call at a time and then returns the value, and the list of its calls.'''
+    calls = []
+    def _call():
+        calls.append(None)
+        if len(calls) <= len(errors): raise errors[len(calls) - 1]
+        return value
+    return _call,calls
+
+# The errors pywin32 raises when Access is busy: the HRESULT itself, or the SCODE in the excepinfo of DISP_E_EXCEPTION.
+_busy = Exception(-2147418111,'Call was rejected by callee.',None,None)
+_busy_inside = Exception(-2147352567,'Exception occurred.',(0,None,None,None,0,-2147417846),None)
+
+def test_com_calls_are_retried_while_access_is_busy():
+    layer = com_call_layer(attempts = 5,backoff = 0)
+    function,calls = _failing([_busy,_busy_inside])
+    assert layer.call('Application.Busy',function) == 'done'
+    assert len(calls) == 3
+    assert layer.report()['retries'] == 2
+
+def test_com_calls_give_up_after_their_attempts():
+    layer = com_call_layer(attempts = 3,backoff = 0)
+    function,calls = _failing([_busy] * 5)
+    with pytest.raises(Exception) as error: layer.call('Application.Busy',function)
+    assert error.value is _busy
+    assert len(calls) == 3
+
+def test_com_calls_that_fail_for_good_are_not_retried():
+    layer = com_call_layer(attempts = 5,backoff = 0)
+    not_found = Exception(-2147352567,'Exception occurred.',(0,'Microsoft Access','Not found',None,0,-2146825023),None)
+    for error in [not_found,ValueError('no')]:
+        function,calls = _failing([error])
+        with pytest.raises(type(error)): layer.call('Application.Missing',function)
+        assert len(calls) == 1
+
+def test_a_layer_wrapped_again_still_ends_hung_calls():
+    # A child process stands in for MS Access: the hung call fails once the process is terminated.
+    access = subprocess.Popen([sys.executable,'-c','import time; time.sleep(60)'])
+    try:
+        layer = com_call_layer(timeout = 0.2)
+        layer.wrap(object(),access.pid)
+        layer.stop()
+        layer.wrap(object(),access.pid)
+
+        def _hang():
+            '''Hangs until Access is gone, or returns after a while if nothing ended it.'''
+            try:
+                access.wait(timeout = 10)
+            except subprocess.TimeoutExpired:
+                return 'returned'
+            raise OSError('The RPC server is unavailable.')
+        with pytest.raises(TimeoutError): layer.call('Application.Hang',_hang)
+        assert layer.report()['timed_out'] is True
+    finally:
+        access.kill()
+        access.wait()